@@ -0,0 +1,269 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+DASHBOARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dashboard')
+sys.path.insert(0, DASHBOARD_DIR)
+
+import matplotlib  # noqa: E402
+matplotlib.use('Agg')
+
+import analytics  # noqa: E402
+import panels  # noqa: E402
+from data_loader import DATA_PATH, DTYPES, write_snapshot, read_snapshot  # noqa: E402
+from date_index import build_date_index  # noqa: E402
+from figure_cache import figure_to_bytes  # noqa: E402
+from forecast import train_forecast  # noqa: E402
+from hourly_histogram import build_hourly_histogram  # noqa: E402
+from partitions import city_monthly_totals, write_partitions  # noqa: E402
+from rolling import WINDOW_DAYS, Z_THRESHOLD, build_moment_index  # noqa: E402
+from rollup import LEVEL_KEYS, build_rollup_cube, coarsen_cube  # noqa: E402
+from value_histogram import BINNED_COLUMNS, build_value_histogram  # noqa: E402
+
+DEFAULT_SCALES = [1, 10, 100, 1000]
+# 105 weeks: longer than the 731 days of the base data, so copies never overlap,
+# and a whole number of weeks, so every copy keeps its weekdays
+TILE_OFFSET = pd.Timedelta(days=735)
+
+
+# Copies of the base data that fit one timeline: dteday is datetime64[ns], which ends in 2262
+def max_tiles(base):
+    return int((pd.Timestamp.max - base['dteday'].max()) // TILE_OFFSET) + 1
+
+
+# (cities, copies per city) for a scale. A city holds as many copies as its timeline fits,
+# larger scales add cities that share the calendar, like the partitioned data of several cities.
+def city_layout(base, scale):
+    if scale < 1:
+        raise ValueError(f'scale must be at least 1, got {scale}')
+    cities = -(-scale // max_tiles(base))
+    while scale % cities:
+        cities += 1
+    return cities, scale // cities
+
+
+# Synthetic rows of one city in the combined_data_clean.csv schema: the real data tiled forward
+# in time with multiplicative noise on the counts and small noise on the weather columns.
+# Only the first copy of city 0 keeps the real values.
+def generate_synthetic(base, scale, city=0):
+    if scale > max_tiles(base):
+        raise ValueError(f'{scale} copies {TILE_OFFSET.days} days apart run past {pd.Timestamp.max}, '
+                         f'at most {max_tiles(base)} fit one city')
+    rng = np.random.default_rng(city)
+    rows = len(base) * scale
+    tile = np.repeat(np.arange(scale), len(base))
+    source = np.tile(np.arange(len(base)), scale)
+    noisy = (tile > 0) | (city > 0)
+
+    data = base.iloc[source].reset_index(drop=True)
+    data['instant'] = np.arange(1, rows + 1)
+    data['dteday'] = data['dteday'] + tile * TILE_OFFSET
+    for column in ['temp', 'atemp', 'hum', 'windspeed']:
+        noise = rng.normal(0, 0.01, rows) * noisy
+        data[column] = np.clip(data[column] + noise, 0, 1).round(4)
+    for column in ['casual', 'registered']:
+        noise = np.where(noisy, rng.lognormal(0, 0.1, rows), 1)
+        data[column] = np.round(data[column] * noise).astype('int64')
+    data['cnt'] = data['casual'] + data['registered']
+    # Lags, rolling windows and the date index all rely on one row per hour in time order
+    assert data['dteday'].is_unique and data['dteday'].is_monotonic_increasing, 'synthetic hours overlap'
+    return data
+
+
+# Minimum and median wall time over `repeat` runs, then one extra run under tracemalloc for the peak
+def measure(func, *args, repeat=3):
+    walls, cpus = [], []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = func(*args)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    gc.collect()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        'wall_seconds': min(walls),
+        'wall_seconds_median': statistics.median(walls),
+        'cpu_seconds': min(cpus),
+        'peak_alloc_bytes': peak,
+    }
+
+
+def _render(plot, *args):
+    figures = plot(*args)
+    if not isinstance(figures, (list, tuple)):
+        figures = [figures]
+    return sum(len(figure_to_bytes(fig)) for fig in figures)
+
+
+# The dashboard holds one city at a time: every stage runs on the first city, city_monthly_totals
+# reads the partitions of all of them
+def bench_scale(base, scale, workdir, repeat):
+    records = []
+    cities, tiles = city_layout(base, scale)
+
+    def stage(name, func, *args, rows=None):
+        result, timing = measure(func, *args, repeat=repeat)
+        record = {'scale': scale, 'cities': cities, 'stage': name, 'rows': rows, **timing}
+        records.append(record)
+        print(f'  {name:<40} {timing["wall_seconds"]:9.4f}s  {timing["peak_alloc_bytes"] / 2**20:9.1f} MiB',
+              file=sys.stderr)
+        return result
+
+    synthetic = generate_synthetic(base, tiles)
+    rows = len(synthetic)
+    path = os.path.join(workdir, f'synthetic_{scale}x.csv')
+    synthetic.to_csv(path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+    del synthetic
+
+    raw = stage('csv_load', lambda: pd.read_csv(path, dtype=DTYPES), rows=rows)
+    dates = stage('datetime_parse', lambda: pd.to_datetime(raw['dteday'], format='%Y-%m-%d %H:%M:%S'), rows=rows)
+    data = raw.assign(dteday=dates)
+    del raw
+
+    stage('snapshot_build', write_snapshot, path, 'benchmark', rows=rows)
+    snapshot = os.path.splitext(path)[0] + '.feather'
+    data = stage('snapshot_read', read_snapshot, snapshot, analytics.DASHBOARD_COLUMNS, rows=rows)
+
+    cube = stage('build_rollup_cube', build_rollup_cube, data, rows=rows)
+    stage('build_calendar_levels', lambda: [coarsen_cube(cube, level) for level in LEVEL_KEYS], rows=rows)
+    stage('build_date_index', build_date_index, data, rows=rows)
+    stage('build_hourly_histogram', build_hourly_histogram, data, rows=rows)
+    stage('build_value_histograms', lambda: [build_value_histogram(data, column) for column in BINNED_COLUMNS], rows=rows)
+    stage('build_moment_index', build_moment_index, data, rows=rows)
+    forecast = stage('train_forecast', train_forecast, data, rows=rows)
+    dataset = analytics.build_dataset(data, 'benchmark', tuple(analytics.DASHBOARD_COLUMNS), forecast)
+
+    # Half of the data, the usual shape of a sidebar selection
+    dteday = data['dteday']
+    start_date = dteday.iloc[0].date()
+    end_date = dteday.iloc[len(dteday) // 2].date()
+    selection = stage('date_filter', analytics.select_range, dataset, start_date, end_date, rows=rows)
+    selected_rows = len(selection['data'])
+    cube = selection['cube']
+    calendar_cube = selection['calendar_cube']
+    values = selection['values']
+
+    comparisons = {
+        'comparison_data_holiday_and_nonholiday': (analytics.comparison_data_holiday_and_nonholiday, (calendar_cube,)),
+        'comparison_holiday_average': (analytics.comparison_holiday_average, (calendar_cube,)),
+        'comparison_seasonal_rentals': (analytics.comparison_seasonal_rentals, (calendar_cube,)),
+        'comparison_weather_conditions': (analytics.comparison_weather_conditions, (cube,)),
+        'comparison_temperature': (analytics.comparison_temperature, (values, calendar_cube)),
+        'comparison_yearly_trends': (analytics.comparison_yearly_trends, (calendar_cube,)),
+        'comparison_wind_speed': (analytics.comparison_wind_speed, (values, calendar_cube)),
+        'comparison_registered_vs_casual': (analytics.comparison_registered_vs_casual, (calendar_cube,)),
+        'comparison_hourly_rentals': (analytics.comparison_hourly_rentals, (cube,)),
+        'comparison_rolling_anomalies': (analytics.comparison_rolling_anomalies,
+                                         (dataset['moments'], start_date, end_date, WINDOW_DAYS[0], Z_THRESHOLD)),
+        'comparison_forecast': (analytics.comparison_forecast, (dataset['forecast'], data, start_date, end_date)),
+    }
+    results = {}
+    for name, (func, args) in comparisons.items():
+        results[name] = stage(name, func, *args, rows=selected_rows)
+
+    weather_mean, weather_sum = results['comparison_weather_conditions']
+    plots = {
+        'plot_holiday_comparison': (panels.plot_holiday_comparison, (results['comparison_holiday_average'],)),
+        'plot_monthly_rentals': (panels.plot_monthly_rentals, (results['comparison_data_holiday_and_nonholiday'],)),
+        'plot_seasonal_rentals': (panels.plot_seasonal_rentals, (results['comparison_seasonal_rentals'],)),
+        'plot_weather_correlation': (panels.plot_weather_correlation, (weather_sum, weather_mean)),
+        'plot_correlation_temperature': (panels.plot_correlation_temperature, results['comparison_temperature']),
+        'plot_yearly_trends': (panels.plot_yearly_trends, (results['comparison_yearly_trends'],)),
+        'plot_wind_speed_effect': (panels.plot_wind_speed_effect, results['comparison_wind_speed']),
+        'plot_registered_vs_casual': (panels.plot_registered_vs_casual, (results['comparison_registered_vs_casual'],)),
+        'plot_hourly_rentals': (panels.plot_hourly_rentals,
+                                (selection['hourly_box_stats'], results['comparison_hourly_rentals'])),
+        'plot_rolling_anomalies': (panels.plot_rolling_anomalies,
+                                   (results['comparison_rolling_anomalies'], WINDOW_DAYS[0], Z_THRESHOLD)),
+        'plot_forecast': (panels.plot_forecast, results['comparison_forecast']),
+    }
+    for name, (plot, args) in plots.items():
+        stage(name, _render, plot, *args, rows=selected_rows)
+
+    del data, dataset, selection
+    root = os.path.join(workdir, f'cities_{scale}x')
+    names = [f'city_{city:04d}' for city in range(cities)]
+    for city, name in enumerate(names):
+        write_partitions(generate_synthetic(base, tiles, city), name, root)
+    stage('city_monthly_totals', city_monthly_totals, names, start_date, end_date, root, rows=rows * cities)
+
+    shutil.rmtree(root)
+    for file in (path, snapshot):
+        os.remove(file)
+    return records
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=DASHBOARD_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time and memory-profile every stage of the dashboard pipeline.')
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help='comma separated multiples of the base data size (default: 1,10,100,1000)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage')
+    parser.add_argument('--data', default=os.path.join(DASHBOARD_DIR, '..', DATA_PATH),
+                        help='cleaned dataset the synthetic data is generated from')
+    parser.add_argument('--output', help='JSON file for the results (default: stdout)')
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.data, parse_dates=['dteday'])
+    scales = [int(value) for value in args.scales.split(',')]
+    # An impossible scale fails here, not after the smaller ones have run
+    for scale in scales:
+        try:
+            city_layout(base, scale)
+        except ValueError as e:
+            parser.error(str(e))
+    report = {
+        'meta': {
+            'created': pd.Timestamp.now(tz='UTC').isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'base_rows': len(base),
+            'repeat': args.repeat,
+        },
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            cities, tiles = city_layout(base, scale)
+            print(f'scale {scale}x ({len(base) * scale} rows, {cities} x {len(base) * tiles} rows per city)',
+                  file=sys.stderr)
+            report['results'] += bench_scale(base, scale, workdir, args.repeat)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
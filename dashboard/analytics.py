@@ -0,0 +1,307 @@
+import pandas as pd
+import numpy as np
+from date_index import append_to_date_index, build_date_index, range_totals, slice_date_range
+from hourly_histogram import append_to_hourly_histogram, boxplot_stats, build_hourly_histogram, range_histogram
+from forecast import FORECAST_COLUMNS, HORIZONS, forecast_next_day, predict_range, train_forecast, update_forecast
+from instrumentation import instrumented
+from rolling import append_to_moment_index, build_moment_index, rolling_anomalies
+from rollup import (
+    LEVEL_KEYS, build_rollup_cube, coarsen_cube, cube_correlation, merge_cubes, rollup, slice_calendar, slice_cube,
+)
+from value_histogram import (
+    BINNED_COLUMNS, append_to_value_histogram, build_value_histogram, range_edges, range_values,
+)
+
+# Columns read by each question, only their union is loaded from the snapshot
+PANEL_COLUMNS = {
+    'holiday': ['dteday', 'holiday', 'cnt'],
+    'seasonal': ['season', 'cnt'],
+    'weather': ['weathersit', 'cnt'],
+    'temperature': ['temp', 'atemp', 'cnt'],
+    'yearly_trends': ['dteday', 'cnt'],
+    'wind_speed': ['windspeed', 'cnt'],
+    'registered_vs_casual': ['dteday', 'casual', 'registered'],
+    'hourly': ['dteday', 'casual', 'registered', 'cnt'],
+    'anomalies': ['dteday', 'cnt'],
+    'forecast': FORECAST_COLUMNS,
+    # Keys and moments of the rollup cube
+    'rollup': ['dteday', 'holiday', 'season', 'weathersit', 'temp', 'atemp', 'windspeed',
+               'casual', 'registered', 'cnt'],
+}
+DASHBOARD_COLUMNS = sorted({column for columns in PANEL_COLUMNS.values() for column in columns})
+
+
+# Parsed rows plus every structure the questions are answered from, forecast models already
+# trained for this version (e.g. loaded from disk) are used instead of fitting new ones.
+# forecast=False leaves the models out, for callers that never show the forecast.
+def build_dataset(data, version, columns, forecast=None):
+    if forecast is None:
+        forecast = train_forecast(data)
+    elif forecast is False:
+        forecast = None
+    cube = build_rollup_cube(data)
+    return {
+        'version': version,
+        'columns': columns,
+        'data': data,
+        'cube': cube,
+        'levels': {level: coarsen_cube(cube, level) for level in LEVEL_KEYS},
+        'date_index': build_date_index(data),
+        'hourly_histogram': build_hourly_histogram(data),
+        'value_histograms': {column: build_value_histogram(data, column) for column in BINNED_COLUMNS},
+        'moments': build_moment_index(data),
+        'forecast': forecast,
+    }
+
+
+# Only the rows after parent_rows are aggregated, the rest is carried over from the parent state
+def extend_dataset(state, data, version, parent_rows):
+    delta = data.iloc[parent_rows:]
+    delta_cube = build_rollup_cube(delta)
+    return {
+        'version': version,
+        'columns': state['columns'],
+        'data': data,
+        'cube': merge_cubes(state['cube'], delta_cube),
+        'levels': {
+            level: merge_cubes(cube, coarsen_cube(delta_cube, level))
+            for level, cube in state['levels'].items()
+        },
+        'date_index': append_to_date_index(state['date_index'], delta),
+        'hourly_histogram': append_to_hourly_histogram(state['hourly_histogram'], delta),
+        'value_histograms': {
+            column: append_to_value_histogram(histogram, delta)
+            for column, histogram in state['value_histograms'].items()
+        },
+        'moments': append_to_moment_index(state['moments'], delta),
+        'forecast': update_forecast(state['forecast'], data) if state['forecast'] is not None else None,
+    }
+
+
+# Everything the questions need for one date range, found by binary search instead of a row scan.
+# 'cube' is the hourly level, 'calendar_cube' the coarser rows the day and month questions need.
+def select_range(dataset, start_date, end_date):
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'data': slice_date_range(dataset['data'], dataset['date_index'], start_date, end_date),
+        'totals': range_totals(dataset['date_index'], start_date, end_date),
+        'cube': slice_cube(dataset['cube'], start_date, end_date),
+        'calendar_cube': slice_calendar(dataset['levels'], start_date, end_date),
+        'hourly_box_stats': boxplot_stats(range_histogram(dataset['hourly_histogram'], start_date, end_date)),
+        'values': {
+            column: range_values(histogram, start_date, end_date)
+            for column, histogram in dataset['value_histograms'].items()
+        },
+    }
+
+# Size, sum and mean of cnt per bin, same intervals as pd.cut(..., include_lowest=True).
+# Only the distinct values of the range are binned, each carrying its row count and cnt total.
+def category_totals(values, bins, labels, category_name):
+    bins = np.asarray(bins, dtype='float64')
+    # Repeated edges (a range with a single value) only leave empty bins
+    if np.any(np.diff(bins) < 0):
+        raise ValueError('bins must increase monotonically.')
+
+    codes = np.searchsorted(bins, values['values'], side='left') - 1
+    if len(bins):
+        codes[values['values'] == bins[0]] = 0
+    valid = (codes >= 0) & (codes < len(labels))
+    codes = codes[valid]
+
+    size = np.bincount(codes, weights=values['counts'][valid], minlength=len(labels)).astype('int64')
+    total = np.bincount(codes, weights=values['cnt'][valid], minlength=len(labels))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / size
+
+    category_totals = pd.DataFrame({
+        category_name: pd.Categorical(labels, categories=labels, ordered=True),
+        'cnt_size': size,
+        'cnt_sum': total.astype('int64'),
+        'cnt_mean': mean,
+    })
+    # Only categories that occur, like groupby(observed=True)
+    return category_totals[size > 0].reset_index(drop=True)
+
+# Q1: Apa dampak hari libur terhadap jumlah penyewaan sepeda?
+@instrumented
+def comparison_data_holiday_and_nonholiday(cube):
+    comparison_holiday_user = rollup(cube, ['year', 'month', 'holiday'], measures=['cnt'])
+
+    # Convert 'year' and 'month' to string to facilitate plotting
+    comparison_holiday_user['year'] = comparison_holiday_user['year'].astype(str)
+    comparison_holiday_user['month'] = comparison_holiday_user['month'].astype(str)
+    comparison_holiday_user['holiday'] = comparison_holiday_user['holiday'].map({0: 'Non-Holiday', 1: 'Holiday'}).astype('category')
+    # Create a new column 'year_month' to combine 'year' and 'month' for clearer x-axis labels
+    comparison_holiday_user['year_month'] = comparison_holiday_user['year'] + '-' + comparison_holiday_user['month'].str.zfill(2)
+
+    return comparison_holiday_user[['year', 'month', 'holiday', 'cnt_sum', 'cnt_mean', 'year_month']]
+
+# Average rentals on holidays vs non-holidays over the whole range
+@instrumented
+def comparison_holiday_average(cube):
+    mean_rentals_by_holiday = rollup(cube, ['holiday'], measures=['cnt'])
+    return mean_rentals_by_holiday[['holiday', 'cnt_mean']].rename(columns={'cnt_mean': 'cnt'})
+
+# Pertanyaan 2: Bagaimana pengaruh musim terhadap jumlah penyewaan sepeda?
+@instrumented
+def comparison_seasonal_rentals(cube):
+    seasons_list = {
+        1: "Musim Semi",
+        2: "Musim Panas",
+        3: "Musim Gugur",
+        4: "Musim Dingin"
+    }
+
+    comparison_seasons = rollup(cube, ['season'], measures=['cnt'])
+    comparison_seasons.insert(1, 'seasons_descriptive', comparison_seasons['season'].map(seasons_list))
+    comparison_seasons = comparison_seasons[['season', 'seasons_descriptive', 'cnt_sum', 'cnt_mean']]
+    comparison_seasons.columns = ['season', 'seasons_descriptive', 'Total Rentals', 'Average Rentals']
+    return comparison_seasons
+
+# Pertanyaan 3: Apakah kondisi cuaca mempengaruhi jumlah penyewaan sepeda?
+@instrumented
+def comparison_weather_conditions(cube):
+    weather_conditions = {
+        1: "Cerah, Sedikit Awan, Sebagian Awan",
+        2: "Kabut + Sedikit Awan, Mist Kabut + Sebagian Awan, Mist Kabut + Pecah Awan, Mist Kabut + Awan",
+        3: "Salju Ringan, Hujan Ringan + Petir + Awan Tersebar, Hujan Ringan + Awan Tersebar",
+        4: "Hujan Lebat + Es Pallet + Badai Petir + Kabut, Salju + Kabut"
+    }
+
+    weather_agg = rollup(cube, ['weathersit'], measures=['cnt'])
+    weather_agg['weathersit_descriptive'] = weather_agg['weathersit'].map(weather_conditions)
+    weather_agg_sum = weather_agg[['weathersit_descriptive', 'cnt_sum']].rename(columns={'cnt_sum': 'cnt'})
+    weather_agg_mean = weather_agg[['weathersit_descriptive', 'cnt_mean']].rename(columns={'cnt_mean': 'cnt'})
+
+    return weather_agg_mean, weather_agg_sum
+
+# Pertanyaan 4: Bagaimana suhu dan suhu yang dirasakan berkorelasi dengan jumlah penyewaan sepeda?
+@instrumented
+def comparison_temperature(values, cube):
+    temperature_correlation = cube_correlation(cube, ['temp', 'atemp', 'cnt'])
+
+    # Adjust bins to dynamically fit the data range, 4 equal segments from min to max
+    bins_temp = range_edges(values['temp'], 4)
+
+    labels = ['Dingin', 'Sejuk', 'Hangat', 'Panas']
+    comparison_temp_category = category_totals(values['temp'], bins_temp, labels, 'temp_category')
+
+    # Define bins for 'atemp' similar to 'temp'
+    bins_atemp = range_edges(values['atemp'], 4)
+    comparison_atemp_category = category_totals(values['atemp'], bins_atemp, labels, 'atemp_category')
+
+    return temperature_correlation, comparison_temp_category, comparison_atemp_category
+
+# Pertanyaan 5 : Bagaimana tren penyewaan sepeda dari tahun ke tahun? Bulan dan tahun manakah yang memiliki permintaan penyewaan sepeda tertinggi/terendah?
+@instrumented
+def comparison_yearly_trends(cube):
+    monthly_rentals = rollup(cube, ['year', 'month'], measures=['cnt'])
+    monthly_rentals = monthly_rentals.rename(columns={'year': 'Year', 'month': 'Month'}).set_index(['Year', 'Month'])
+    monthly_rentals = monthly_rentals[['cnt_sum', 'cnt_mean']]
+    monthly_rentals.columns = ['Total Rentals', 'Average Rentals']
+    return monthly_rentals
+
+# Pertanyaan 6: Bagaimana kecepatan angin mempengaruhi penyewaan sepeda?
+@instrumented
+def comparison_wind_speed(values, cube):
+    correlation_wind_count = cube_correlation(cube, ['windspeed', 'cnt'])
+
+    # Define wind speed bins and labels, open-ended so a range without calm or windy hours still bins
+    bins = [-np.inf, 0.1, 0.2, np.inf]
+    labels = ['Rendah', 'Sedang', 'Tinggi']
+
+    # Aggregate bike rentals by wind speed category
+    windspeed_effect = category_totals(values['windspeed'], bins, labels, 'windspeed_category')
+    windspeed_effect = windspeed_effect[['windspeed_category', 'cnt_mean']].rename(columns={'cnt_mean': 'cnt'})
+    return correlation_wind_count, windspeed_effect
+
+# Pertanyaan 7: Siapa yang lebih banyak menggunakan layanan penyewaan sepeda, pengguna biasa atau pengguna terdaftar?
+@instrumented
+def comparison_registered_vs_casual(cube):
+    user_comparison_year_month = rollup(cube, ['year', 'month'], measures=['casual', 'registered'])
+
+    user_comparison_melted = user_comparison_year_month.melt(
+        id_vars=['year', 'month'],
+        value_vars=['casual_sum', 'registered_sum'],
+        var_name='User_Type', 
+        value_name='Count'
+    )
+
+    return user_comparison_melted
+
+# Pertanyaan 8: Pada jam berapa saja penyewaan sepeda memiliki pengguna terbanyak dan tersedikit?
+@instrumented
+def comparison_hourly_rentals(cube):
+    average_hourly_user = rollup(cube, ['hour'])
+    average_hourly_user = average_hourly_user[['hour', 'casual_sum', 'casual_mean', 'registered_sum',
+                                               'registered_mean', 'cnt_sum', 'cnt_mean']]
+
+    average_hourly_user.columns = [''.join(col).strip() for col in average_hourly_user.columns.values]
+
+    # Reset the index if 'hour' is not already a column
+    average_hourly_user.reset_index(inplace=True)
+    return average_hourly_user
+
+# Deteksi anomali: jam mana yang penyewaannya menyimpang jauh dari jam yang sama pada hari-hari sebelumnya?
+@instrumented
+def comparison_rolling_anomalies(moments, start_date, end_date, window_days, threshold):
+    return rolling_anomalies(moments, start_date, end_date, window_days, threshold)
+
+# Prakiraan: berapa penyewaan satu jam dan satu hari ke depan?
+@instrumented
+def comparison_forecast(forecast, data, start_date, end_date):
+    # Out of sample: every month of the range comes from the fit on the rows before that month
+    predictions = predict_range(forecast, data, start_date, end_date, backtest=True)
+    errors = pd.DataFrame([
+        {'model': name, 'horizon': horizon, 'mae': (predictions[name] - predictions['cnt']).abs().mean(),
+         'hours': int(predictions[name].notna().sum())}
+        for name, horizon in HORIZONS.items()
+    ])
+    # The last two stored days next to the forecast of the day after them
+    outlook = pd.concat([data[['dteday', 'cnt']].iloc[-48:], forecast_next_day(forecast, data)], ignore_index=True)
+    return predictions, errors, outlook
+
+# Longer hourly series are drawn as daily means: a figure is a few thousand pixels wide, drawing
+# grows with every point, and Altair refuses more than 5000 rows per chart
+MAX_SERIES_POINTS = 4000
+
+
+def daily_series(series, max_points=MAX_SERIES_POINTS):
+    if len(series) <= max_points:
+        return series
+    return series.groupby(series['dteday'].dt.normalize()).mean().drop(columns='dteday').reset_index()
+
+
+def hourly_distribution(hourly_box_stats):
+    return pd.DataFrame([
+        {'hour': stats['label'], 'whislo': stats['whislo'], 'q1': stats['q1'], 'med': stats['med'],
+         'q3': stats['q3'], 'whishi': stats['whishi'], 'outliers': len(stats['fliers'])}
+        for stats in hourly_box_stats
+    ])
+
+
+# Results of all eight questions for one selected range, as plain DataFrames keyed by table name
+def question_results(selection):
+    values, cube, calendar_cube = selection['values'], selection['cube'], selection['calendar_cube']
+    weather_agg_mean, weather_agg_sum = comparison_weather_conditions(cube)
+    temperature_correlation, comparison_temp_category, comparison_atemp_category = comparison_temperature(values, calendar_cube)
+    correlation_wind_count, windspeed_effect = comparison_wind_speed(values, calendar_cube)
+
+    return {
+        'totals': pd.DataFrame([selection['totals']]),
+        'holiday_average': comparison_holiday_average(calendar_cube),
+        'holiday_monthly': comparison_data_holiday_and_nonholiday(calendar_cube),
+        'seasonal': comparison_seasonal_rentals(calendar_cube),
+        'weather_mean': weather_agg_mean,
+        'weather_sum': weather_agg_sum,
+        'temperature_correlation': temperature_correlation.rename_axis('variable').reset_index(),
+        'temp_category': comparison_temp_category,
+        'atemp_category': comparison_atemp_category,
+        'yearly_trends': comparison_yearly_trends(calendar_cube).reset_index(),
+        'wind_correlation': correlation_wind_count.rename_axis('variable').reset_index(),
+        'windspeed_category': windspeed_effect,
+        'registered_vs_casual': comparison_registered_vs_casual(calendar_cube),
+        'hourly': comparison_hourly_rentals(cube),
+        'hourly_distribution': hourly_distribution(selection['hourly_box_stats']),
+    }
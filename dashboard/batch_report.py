@@ -0,0 +1,91 @@
+import argparse
+import os
+
+import pandas as pd
+
+from analytics import DASHBOARD_COLUMNS, build_dataset, question_results, select_range
+from data_loader import DATA_PATH, hash_file, read_data
+from partitions import PARTITION_ROOT, list_partitions, partitions_version, prune_partitions, read_partitions
+
+
+def parse_range(value):
+    try:
+        start, end = value.split(':')
+        start_date, end_date = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected START:END (YYYY-MM-DD:YYYY-MM-DD), got {value!r}')
+    if start_date > end_date:
+        raise argparse.ArgumentTypeError(f'start date after end date in {value!r}')
+    return start_date, end_date
+
+
+def read_ranges_file(path):
+    ranges = pd.read_csv(path, usecols=['start_date', 'end_date'])
+    return [parse_range(f'{row.start_date}:{row.end_date}') for row in ranges.itertuples()]
+
+
+# The data is read and aggregated once, every range is then a slice of the same structures.
+# Returns one DataFrame per result table with the range prepended as columns.
+def compute_reports(ranges, path=DATA_PATH, city=None, root=PARTITION_ROOT):
+    if city is not None:
+        # Only the months between the first start and the last end date are read
+        start_date = min(start for start, _ in ranges) if ranges else None
+        end_date = max(end for _, end in ranges) if ranges else None
+        version = partitions_version(prune_partitions(list_partitions(root, city), start_date, end_date))
+        data = read_partitions(root, city, DASHBOARD_COLUMNS, start_date, end_date)
+    else:
+        version = hash_file(path)
+        data = read_data(DASHBOARD_COLUMNS, path, version)
+    # The reports answer the eight questions only, no forecast models are fitted
+    dataset = build_dataset(data, version, tuple(DASHBOARD_COLUMNS), forecast=False)
+    if not ranges:
+        dates = dataset['data']['dteday']
+        ranges = [(dates.min().date(), dates.max().date())]
+
+    tables = {}
+    for start_date, end_date in ranges:
+        for name, result in question_results(select_range(dataset, start_date, end_date)).items():
+            result = result.copy()
+            result.insert(0, 'start_date', start_date.isoformat())
+            result.insert(1, 'end_date', end_date.isoformat())
+            tables.setdefault(name, []).append(result)
+    return {name: pd.concat(results, ignore_index=True) for name, results in tables.items()}
+
+
+def write_reports(reports, output_dir, output_format='csv'):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name, report in reports.items():
+        path = os.path.join(output_dir, f'{name}.{output_format}')
+        if output_format == 'json':
+            report.to_json(path, orient='records', indent=2)
+        else:
+            report.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compute the results of every dashboard question for one or more date ranges.')
+    parser.add_argument('--range', dest='ranges', action='append', type=parse_range, default=[],
+                        metavar='START:END', help='date range, inclusive, can be given several times')
+    parser.add_argument('--ranges-file', help='CSV with start_date and end_date columns')
+    parser.add_argument('--data', default=DATA_PATH, help='cleaned dataset CSV')
+    parser.add_argument('--city', help='read the monthly partitions of this city instead of --data')
+    parser.add_argument('--root', default=PARTITION_ROOT, help='partition root directory, used with --city')
+    parser.add_argument('--output', default='./reports', help='directory the result tables are written to')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    args = parser.parse_args()
+
+    ranges = list(args.ranges)
+    if args.ranges_file:
+        ranges += read_ranges_file(args.ranges_file)
+
+    reports = compute_reports(ranges, args.data, args.city, args.root)
+    for path in write_reports(reports, args.output, args.format):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
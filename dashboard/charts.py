@@ -0,0 +1,314 @@
+import altair as alt
+import pandas as pd
+from instrumentation import instrumented
+from analytics import (
+    comparison_data_holiday_and_nonholiday,
+    comparison_holiday_average,
+    comparison_seasonal_rentals,
+    comparison_weather_conditions,
+    comparison_temperature,
+    comparison_yearly_trends,
+    comparison_wind_speed,
+    comparison_registered_vs_casual,
+    comparison_hourly_rentals,
+    comparison_rolling_anomalies,
+    comparison_forecast,
+    daily_series,
+    hourly_distribution,
+)
+from partitions import city_monthly_totals
+
+# Interactive counterparts of the plot_* functions in panels.py. Only the small aggregated
+# tables are sent to the browser, hover, zoom and legend toggles run client-side in Vega-Lite.
+
+HOLIDAY_LABELS = {0: 'Non-Holiday', 1: 'Holiday'}
+
+
+def _correlation_heatmap(correlation_matrix, title):
+    cells = correlation_matrix.rename_axis('x').reset_index().melt(id_vars='x', var_name='y', value_name='r')
+    base = alt.Chart(cells, title=title).encode(
+        x=alt.X('x:N', title=None, sort=list(correlation_matrix.columns)),
+        y=alt.Y('y:N', title=None, sort=list(correlation_matrix.columns)),
+    )
+    heatmap = base.mark_rect().encode(
+        color=alt.Color('r:Q', scale=alt.Scale(scheme='redblue', domain=[-1, 1], reverse=True), title='Korelasi'),
+        tooltip=['x', 'y', alt.Tooltip('r:Q', format='.2f')],
+    )
+    labels = base.mark_text().encode(text=alt.Text('r:Q', format='.2f'))
+    return heatmap + labels
+
+
+# Bars for the sum and a line for the mean on their own y axes, the matplotlib twinx layout
+def _sum_and_mean(data, x, sum_column, mean_column, title, sum_title, mean_title, bar_color, line_color):
+    base = alt.Chart(data, title=title).encode(x=x)
+    bars = base.mark_bar(color=bar_color, opacity=0.7).encode(
+        y=alt.Y(f'{sum_column}:Q', title=sum_title),
+        tooltip=[alt.Tooltip(f'{sum_column}:Q', format=',.0f'), alt.Tooltip(f'{mean_column}:Q', format=',.1f')],
+    )
+    line = base.mark_line(color=line_color, point=True).encode(y=alt.Y(f'{mean_column}:Q', title=mean_title))
+    return alt.layer(bars, line).resolve_scale(y='independent')
+
+
+@instrumented
+def chart_holiday_comparison(mean_rentals_by_holiday):
+    data = mean_rentals_by_holiday.assign(holiday=mean_rentals_by_holiday['holiday'].map(HOLIDAY_LABELS))
+    return alt.Chart(data, title='Perbandingan Rata-Rata Penyewaan Sepeda: Hari Libur vs Bukan Hari Libur').mark_bar(color='#d62728', opacity=0.6).encode(
+        x=alt.X('holiday:N', title='Jenis Hari', sort=list(HOLIDAY_LABELS.values())),
+        y=alt.Y('cnt:Q', title='Rata-Rata Penyewaan Sepeda'),
+        tooltip=['holiday', alt.Tooltip('cnt:Q', format='.1f')],
+    )
+
+
+@instrumented
+def chart_monthly_rentals(comparison_holiday_user):
+    data = comparison_holiday_user.assign(holiday=comparison_holiday_user['holiday'].astype(str))
+    legend = alt.selection_point(fields=['holiday'], bind='legend')
+    return alt.Chart(data, title='Rata Rata Penyewaan Sepeda Berdasarkan Tahun dan Bulan: Hari Libur vs Bukan Hari Libur').mark_bar().encode(
+        x=alt.X('year_month:N', title='Year-Month (YYYY-MM)'),
+        xOffset='holiday:N',
+        y=alt.Y('cnt_mean:Q', title='Rata-Rata Penyewaan Sepeda'),
+        color=alt.Color('holiday:N', title='Holiday', scale=alt.Scale(scheme='redblue')),
+        opacity=alt.condition(legend, alt.value(1), alt.value(0.2)),
+        tooltip=['year_month', 'holiday', alt.Tooltip('cnt_mean:Q', format='.1f'), alt.Tooltip('cnt_sum:Q', format=',')],
+    ).add_params(legend)
+
+
+@instrumented
+def chart_seasonal_rentals(comparison_seasons):
+    return _sum_and_mean(
+        comparison_seasons, alt.X('seasons_descriptive:N', title='Musim', sort=alt.SortField('season')),
+        'Total Rentals', 'Average Rentals', 'Penyewaan Sepeda: Total vs Rata-rata per Musim',
+        'Total Rental', 'Rata-rata Rental', '#d62728', '#1f77b4',
+    )
+
+
+@instrumented
+def chart_weather_correlation(weather_sum, weather_mean):
+    def pie(data, title):
+        data = data.assign(share=data['cnt'] / data['cnt'].sum())
+        return alt.Chart(data, title=title).mark_arc().encode(
+            theta='cnt:Q',
+            color=alt.Color('weathersit_descriptive:N', title='Kondisi Cuaca', legend=alt.Legend(orient='bottom', columns=1)),
+            tooltip=['weathersit_descriptive', alt.Tooltip('cnt:Q', format=',.1f'), alt.Tooltip('share:Q', format='.2%')],
+        )
+
+    return alt.hconcat(
+        pie(weather_sum, 'Total Penyewaan Sepeda Berdasarkan Kondisi Cuaca'),
+        pie(weather_mean, 'Rata Rata Penyewaan Sepeda Berdasarkan Kondisi Cuaca'),
+    )
+
+
+def _category_bars(data, category, value, title, x_title, y_title):
+    return alt.Chart(data, title=title).mark_bar().encode(
+        x=alt.X(f'{category}:N', title=x_title, sort=list(data[category].cat.categories)),
+        y=alt.Y(f'{value}:Q', title=y_title),
+        color=alt.Color(f'{category}:N', scale=alt.Scale(scheme='redblue', reverse=True), legend=None),
+        tooltip=[category, alt.Tooltip(f'{value}:Q', format=',.1f')],
+    )
+
+
+@instrumented
+def chart_correlation_temperature(correlation_matrix, comparison_temp_category, comparison_atemp_category):
+    heatmap = _correlation_heatmap(correlation_matrix, 'Korelasi antara Variabel Suhu, Sensasi Suhu, dan Jumlah Rental')
+    categories = alt.hconcat(
+        _category_bars(comparison_temp_category, 'temp_category', 'cnt_sum',
+                       'Total Penyewaan Sepeda berdasarkan Kategori Suhu', 'Kategori Suhu', 'Total Rentals'),
+        _category_bars(comparison_atemp_category, 'atemp_category', 'cnt_sum',
+                       'Total Penyewaan Sepeda berdasarkan Kategori Sensasi Suhu', 'Kategori Sensasi Suhu', 'Total Rental'),
+    )
+    return heatmap, categories
+
+
+@instrumented
+def chart_yearly_trends(monthly_rentals):
+    data = monthly_rentals.reset_index()
+    data['Year-Month'] = data['Year'].astype(str) + '-' + data['Month'].astype(str).str.zfill(2)
+    return _sum_and_mean(
+        data, alt.X('Year-Month:N', title='Year-Month (YYYY-MM)'), 'Total Rentals', 'Average Rentals',
+        'Bike Rentals: Total and Trend Over Time', 'Total Rentals', 'Average Rentals', 'lightblue', 'green',
+    )
+
+
+@instrumented
+def chart_wind_speed_effect(correlation_wind_count, windspeed_effect):
+    heatmap = _correlation_heatmap(correlation_wind_count, 'Korelasi antara Kecepatan Angin dan Jumlah Rental')
+    bars = _category_bars(windspeed_effect, 'windspeed_category', 'cnt',
+                          'Rata-Rata Penyewaan Sepeda berdasarkan Kategori Kecepatan Angin',
+                          'Kategori Kecepatan Angin', 'Rata-Rata Rental')
+    return heatmap, bars
+
+
+@instrumented
+def chart_registered_vs_casual(user_comparison_melted):
+    legend = alt.selection_point(fields=['User_Type'], bind='legend')
+    return alt.Chart(user_comparison_melted, title='Bike Rentals: Casual vs. Registered Users').mark_bar().encode(
+        x=alt.X('month:O', title='Bulan'),
+        xOffset='User_Type:N',
+        y=alt.Y('mean(Count):Q', title='Total Pengguna'),
+        color=alt.Color('User_Type:N', title='User Type'),
+        opacity=alt.condition(legend, alt.value(1), alt.value(0.2)),
+        tooltip=['month', 'User_Type', alt.Tooltip('mean(Count):Q', format=',.0f')],
+    ).add_params(legend)
+
+
+@instrumented
+def chart_hourly_rentals(hourly_box_stats, average_hourly_user):
+    # Box, whiskers and capped outliers drawn from the precomputed per-hour statistics
+    stats = hourly_distribution(hourly_box_stats)
+    base = alt.Chart(stats, title='Distribution of Bike Rentals Per Hour').encode(x=alt.X('hour:O', title='Hour'))
+    whiskers = base.mark_rule().encode(y=alt.Y('whislo:Q', title='Total User'), y2='whishi:Q')
+    boxes = base.mark_bar(size=14).encode(
+        y='q1:Q', y2='q3:Q',
+        color=alt.Color('hour:O', scale=alt.Scale(scheme='redblue', reverse=True), legend=None),
+        tooltip=['hour', alt.Tooltip('whislo:Q', format='.0f'), alt.Tooltip('q1:Q', format='.0f'),
+                 alt.Tooltip('med:Q', format='.0f'), alt.Tooltip('q3:Q', format='.0f'), alt.Tooltip('whishi:Q', format='.0f')],
+    )
+    medians = base.mark_tick(color='black', size=14).encode(y='med:Q')
+    fliers = pd.DataFrame([
+        {'hour': box['label'], 'value': value} for box in hourly_box_stats for value in box['fliers']
+    ], columns=['hour', 'value'])
+    outliers = alt.Chart(fliers).mark_point(shape='diamond', size=15, color='gray').encode(x='hour:O', y='value:Q')
+    distribution = alt.layer(whiskers, boxes, medians, outliers).interactive(bind_x=False)
+
+    hour = alt.X('hour:O', title='Jam dalam Sehari')
+    summaries = [
+        _sum_and_mean(average_hourly_user, hour, 'cnt_sum', 'cnt_mean', 'Total Rental (Jumlah dan Rata-Rata) per Jam',
+                      'Total Rentals (Jumlah)', 'Total Rental (Rata - Rata)', 'skyblue', 'orange'),
+        _sum_and_mean(average_hourly_user, hour, 'casual_sum', 'casual_mean', 'Casual Rentals (Jumlah dan Rata-rata) per Jam',
+                      'Casual Rentals (Jumlah)', 'Casual Rentals (Rata-rata)', 'lightgreen', 'darkgreen'),
+        _sum_and_mean(average_hourly_user, hour, 'registered_sum', 'registered_mean', 'Registered Rentals (Sum & Mean) per Hour',
+                      'Registered Rentals (Jumlah)', 'Registered Rentals (Rata-rata)', 'thistle', 'purple'),
+    ]
+    return [distribution] + summaries
+
+
+@instrumented
+def chart_city_comparison(city_monthly):
+    data = city_monthly.assign(
+        year_month=city_monthly['year'].astype(str) + '-' + city_monthly['month'].astype(str).str.zfill(2))
+    legend = alt.selection_point(fields=['city'], bind='legend')
+    trend = alt.Chart(data, title='Total Penyewaan Sepeda per Bulan di Setiap Kota').mark_line(point=True).encode(
+        x=alt.X('year_month:N', title='Year-Month (YYYY-MM)'),
+        y=alt.Y('cnt:Q', title='Total Rental'),
+        color=alt.Color('city:N', title='Kota'),
+        opacity=alt.condition(legend, alt.value(1), alt.value(0.2)),
+        tooltip=['city', 'year_month', alt.Tooltip('cnt:Q', format=','), alt.Tooltip('cnt_mean:Q', format='.1f')],
+    ).add_params(legend)
+
+    totals = data.groupby('city', sort=True)[['hours', 'registered', 'casual']].sum()
+    averages = totals[['registered', 'casual']].div(totals['hours'], axis=0).reset_index().melt(
+        id_vars='city', var_name='User_Type', value_name='Average')
+    average = alt.Chart(averages, title='Rata-Rata Penyewaan Sepeda per Jam: Pengguna Terdaftar dan Biasa per Kota').mark_bar().encode(
+        x=alt.X('city:N', title='Kota'),
+        y=alt.Y('Average:Q', title='Rata-Rata Rental per Jam', stack='zero'),
+        color=alt.Color('User_Type:N', title='User Type'),
+        tooltip=['city', 'User_Type', alt.Tooltip('Average:Q', format='.1f')],
+    )
+    return trend, average
+
+
+@instrumented
+def chart_rolling_anomalies(anomalies, window_days, threshold):
+    flagged = anomalies.loc[anomalies['anomaly'], ['dteday', 'cnt', 'baseline_mean', 'zscore']]
+    series = daily_series(anomalies[['dteday', 'cnt', 'rolling_mean', 'rolling_std', 'zscore']])
+    series = series.assign(lower=series['rolling_mean'] - 2 * series['rolling_std'],
+                           upper=series['rolling_mean'] + 2 * series['rolling_std'])
+
+    zoom = alt.selection_interval(encodings=['x'], bind='scales')
+    date = alt.X('dteday:T', title='Tanggal')
+    base = alt.Chart(series).encode(x=date)
+    band = base.mark_area(color='steelblue', opacity=0.15).encode(y='lower:Q', y2='upper:Q')
+    rentals = base.mark_line(color='lightgray', strokeWidth=0.8).encode(y=alt.Y('cnt:Q', title='Total Rental'))
+    mean = base.mark_line(color='steelblue').encode(
+        y='rolling_mean:Q',
+        tooltip=[alt.Tooltip('dteday:T', title='Tanggal'), alt.Tooltip('cnt:Q', format='.0f'),
+                 alt.Tooltip('rolling_mean:Q', format='.1f'), alt.Tooltip('rolling_std:Q', format='.1f')],
+    )
+    points = alt.Chart(flagged).mark_point(color='#d62728', filled=True, size=30).encode(
+        x=date, y='cnt:Q',
+        tooltip=[alt.Tooltip('dteday:T', title='Jam', format='%Y-%m-%d %H:00'), 'cnt:Q',
+                 alt.Tooltip('baseline_mean:Q', format='.1f'), alt.Tooltip('zscore:Q', format='.2f')],
+    )
+    trend = alt.layer(band, rentals, mean, points).properties(
+        title=f'Penyewaan Sepeda per Jam dengan Rata-Rata Bergulir {window_days} Hari').add_params(zoom)
+
+    limits = pd.DataFrame({'zscore': [threshold, -threshold]})
+    zscore = alt.layer(
+        alt.Chart(series).mark_line(color='gray', strokeWidth=0.6).encode(x=date, y=alt.Y('zscore:Q', title='Z-Score')),
+        alt.Chart(flagged).mark_point(color='#d62728', filled=True, size=30).encode(x=date, y='zscore:Q'),
+        alt.Chart(limits).mark_rule(color='#d62728', strokeDash=[4, 4]).encode(y='zscore:Q'),
+    ).properties(
+        title=f'Z-Score terhadap Jam yang Sama {window_days} Hari Sebelumnya ({len(flagged)} anomali)').add_params(zoom)
+    return trend, zscore
+
+
+@instrumented
+def chart_forecast(predictions, errors, outlook):
+    mae = dict(zip(errors['model'], errors['mae']))
+    labels = {'cnt': 'Aktual',
+              'hour_ahead': f'Prakiraan 1 Jam ke Depan (MAE uji mundur {mae["hour_ahead"]:.1f})',
+              'day_ahead': f'Prakiraan 1 Hari ke Depan (MAE uji mundur {mae["day_ahead"]:.1f})'}
+    series = daily_series(predictions).rename(columns=labels)
+
+    legend = alt.selection_point(fields=['Seri'], bind='legend')
+    backtest = alt.Chart(series, title='Penyewaan Sepeda per Jam: Aktual vs Prakiraan (uji mundur, tiap bulan dari model data sebelumnya)').transform_fold(
+        list(labels.values()), as_=['Seri', 'Rental'],
+    ).mark_line(strokeWidth=1).encode(
+        x=alt.X('dteday:T', title='Tanggal'),
+        y=alt.Y('Rental:Q', title='Total Rental'),
+        color=alt.Color('Seri:N', scale=alt.Scale(domain=list(labels.values()), range=['lightgray', 'steelblue', 'orange'])),
+        opacity=alt.condition(legend, alt.value(1), alt.value(0.15)),
+        tooltip=[alt.Tooltip('dteday:T', title='Tanggal'), 'Seri:N', alt.Tooltip('Rental:Q', format='.0f')],
+    ).add_params(legend).interactive(bind_y=False)
+
+    hour = alt.X('dteday:T', title='Jam', axis=alt.Axis(format='%d %b %H:00'))
+    recent = alt.Chart(outlook.dropna(subset=['cnt'])).mark_line(color='gray', point=True).encode(
+        x=hour, y=alt.Y('cnt:Q', title='Total Rental'),
+        tooltip=[alt.Tooltip('dteday:T', title='Jam', format='%Y-%m-%d %H:00'), alt.Tooltip('cnt:Q', title='Aktual')],
+    )
+    ahead = alt.Chart(outlook.dropna(subset=['day_ahead'])).mark_bar(color='orange', opacity=0.7).encode(
+        x=hour, y='day_ahead:Q',
+        tooltip=[alt.Tooltip('dteday:T', title='Jam', format='%Y-%m-%d %H:00'),
+                 alt.Tooltip('day_ahead:Q', title='Prakiraan', format='.0f')],
+    )
+    outlook_chart = alt.layer(recent, ahead).properties(title='Prakiraan Penyewaan Sepeda 24 Jam Setelah Data Terakhir')
+    return backtest, outlook_chart
+
+
+# Panel chart builders, same arguments as the draw_*_panel functions in panels.py
+def chart_holiday_panel(cube):
+    comparison_data_holiday_and_nonholiday_data = comparison_data_holiday_and_nonholiday(cube)
+    mean_rentals_by_holiday = comparison_holiday_average(cube)
+    return [chart_holiday_comparison(mean_rentals_by_holiday), chart_monthly_rentals(comparison_data_holiday_and_nonholiday_data)]
+
+def chart_seasonal_panel(cube):
+    return [chart_seasonal_rentals(comparison_seasonal_rentals(cube))]
+
+def chart_weather_panel(cube):
+    weather_agg_mean, weather_agg_sum = comparison_weather_conditions(cube)
+    return [chart_weather_correlation(weather_agg_sum, weather_agg_mean)]
+
+def chart_temperature_panel(values, cube):
+    return list(chart_correlation_temperature(*comparison_temperature(values, cube)))
+
+def chart_yearly_trends_panel(cube):
+    return [chart_yearly_trends(comparison_yearly_trends(cube))]
+
+def chart_wind_speed_panel(values, cube):
+    return list(chart_wind_speed_effect(*comparison_wind_speed(values, cube)))
+
+def chart_registered_vs_casual_panel(cube):
+    return [chart_registered_vs_casual(comparison_registered_vs_casual(cube))]
+
+def chart_hourly_panel(hourly_box_stats, cube):
+    return chart_hourly_rentals(hourly_box_stats, comparison_hourly_rentals(cube))
+
+def chart_city_panel(cities, start_date, end_date):
+    return list(chart_city_comparison(city_monthly_totals(cities, start_date, end_date)))
+
+def chart_anomaly_panel(moments, start_date, end_date, window_days, threshold):
+    anomalies = comparison_rolling_anomalies(moments, start_date, end_date, window_days, threshold)
+    return list(chart_rolling_anomalies(anomalies, window_days, threshold))
+
+def chart_forecast_panel(forecast, data, start_date, end_date):
+    return list(chart_forecast(*comparison_forecast(forecast, data, start_date, end_date)))
@@ -0,0 +1,143 @@
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+DATA_PATH = './data/combined_data_clean.csv'
+SNAPSHOT_VERSION_KEY = b'source_version'
+# Set by append_snapshot, lets the dashboard extend its aggregates instead of rebuilding them
+SNAPSHOT_PARENT_VERSION_KEY = b'parent_version'
+SNAPSHOT_PARENT_ROWS_KEY = b'parent_rows'
+
+# Compact dtypes for the cleaned hourly data, every code column fits in int8
+DTYPES = {
+    'instant': 'int32',
+    'season': 'int8',
+    'holiday': 'int8',
+    'weekday': 'int8',
+    'workingday': 'int8',
+    'weathersit': 'int8',
+    'temp': 'float32',
+    'atemp': 'float32',
+    'hum': 'float32',
+    'windspeed': 'float32',
+    'casual': 'int32',
+    'registered': 'int32',
+    'cnt': 'int32',
+}
+
+
+# Cheap stat of the source file, this is what every rerun pays
+def file_signature(path=DATA_PATH):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_clean_data(path=DATA_PATH):
+    data = pd.read_csv(path, dtype=DTYPES)
+    data['dteday'] = pd.to_datetime(data['dteday'], format='%Y-%m-%d %H:%M:%S')
+    # Range lookups binary-search on dteday, so the stored order must be chronological
+    if not data['dteday'].is_monotonic_increasing:
+        data = data.sort_values('dteday', kind='stable', ignore_index=True)
+    return data
+
+
+def snapshot_path(path=DATA_PATH):
+    return os.path.splitext(path)[0] + '.feather'
+
+
+# Write an uncompressed Arrow IPC (Feather v2) copy of the CSV so it can be memory-mapped,
+# tagged with the hash of the CSV it was built from
+def write_snapshot(path=DATA_PATH, version=None):
+    if version is None:
+        version = hash_file(path)
+    table = pa.Table.from_pandas(read_clean_data(path), preserve_index=False)
+    return _replace_snapshot(snapshot_path(path), table, {SNAPSHOT_VERSION_KEY: version.encode()})
+
+
+# Write through write(file) next to the target and rename it, readers never see a half-written file
+def write_atomic(path, write, mode='wb'):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def _replace_snapshot(snapshot, table, extra_metadata):
+    metadata = dict(table.schema.metadata or {})
+    for key in (SNAPSHOT_VERSION_KEY, SNAPSHOT_PARENT_VERSION_KEY, SNAPSHOT_PARENT_ROWS_KEY):
+        metadata.pop(key, None)
+    metadata.update(extra_metadata)
+    table = table.replace_schema_metadata(metadata)
+    return write_atomic(snapshot, lambda f: feather.write_feather(table, f, compression='uncompressed'))
+
+
+def snapshot_metadata(snapshot):
+    if not os.path.exists(snapshot):
+        return {}
+    with pa.memory_map(snapshot) as source:
+        return pa.ipc.open_file(source).schema.metadata or {}
+
+
+def snapshot_version(snapshot):
+    return snapshot_metadata(snapshot).get(SNAPSHOT_VERSION_KEY, b'').decode() or None
+
+
+# (parent version, parent row count) when the snapshot is the parent plus appended rows
+def snapshot_parent(snapshot):
+    metadata = snapshot_metadata(snapshot)
+    if SNAPSHOT_PARENT_VERSION_KEY not in metadata:
+        return None
+    return metadata[SNAPSHOT_PARENT_VERSION_KEY].decode(), int(metadata[SNAPSHOT_PARENT_ROWS_KEY])
+
+
+# Extend the snapshot with already cleaned rows, the existing columns are mapped, not parsed
+def append_snapshot(rows, path=DATA_PATH, parent_version=None, version=None):
+    snapshot = snapshot_path(path)
+    if version is None:
+        version = hash_file(path)
+    if parent_version is None or snapshot_version(snapshot) != parent_version:
+        # No usable parent snapshot, build it from the CSV that already includes the rows
+        return write_snapshot(path, version)
+
+    existing = feather.read_table(snapshot, memory_map=True)
+    appended = pa.Table.from_pandas(rows.astype(DTYPES), preserve_index=False)
+    appended = appended.select(existing.column_names).cast(existing.schema)
+    table = pa.concat_tables([existing, appended])
+    return _replace_snapshot(snapshot, table, {
+        SNAPSHOT_VERSION_KEY: version.encode(),
+        SNAPSHOT_PARENT_VERSION_KEY: parent_version.encode(),
+        SNAPSHOT_PARENT_ROWS_KEY: str(existing.num_rows).encode(),
+    })
+
+
+# Only the requested columns are mapped, numeric columns come back without a copy
+def read_snapshot(snapshot, columns=None):
+    table = feather.read_table(snapshot, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+# Read through the snapshot, rebuilding it first when it does not match the CSV
+def read_data(columns=None, path=DATA_PATH, version=None):
+    if version is None:
+        version = hash_file(path)
+    snapshot = snapshot_path(path)
+    if snapshot_version(snapshot) != version:
+        write_snapshot(path, version)
+    return read_snapshot(snapshot, list(columns) if columns else None)
@@ -0,0 +1,28 @@
+import streamlit as st
+
+from data_loader import DATA_PATH
+from partitions import PARTITION_ROOT
+from refresher import CityDatasetRefresher, DatasetRefresher
+
+
+# One refresher per data source for the whole server, every session reads the same state
+# and no session pays for a rebuild when the data changes
+@st.cache_resource(show_spinner='Memuat data...')
+def get_refresher(columns, path=DATA_PATH):
+    refresher = DatasetRefresher(columns, path)
+    refresher.current()
+    return refresher.start()
+
+
+# Cities are loaded on first selection only, an unused city costs nothing
+@st.cache_resource(show_spinner='Memuat data kota...')
+def get_city_refresher(columns, city, root=PARTITION_ROOT):
+    refresher = CityDatasetRefresher(columns, city, root)
+    refresher.current()
+    return refresher.start()
+
+
+def load_dataset(columns, path=DATA_PATH, city=None):
+    if city is not None:
+        return get_city_refresher(tuple(columns), city).current()
+    return get_refresher(tuple(columns), path).current()
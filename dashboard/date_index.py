@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+PREFIX_COLUMNS = ['cnt', 'registered', 'casual']
+
+
+# Sorted timestamps plus running totals, prefix_sums[c][i] is the sum of the first i rows
+def build_date_index(data):
+    dates = data['dteday'].to_numpy()
+    if not data['dteday'].is_monotonic_increasing:
+        raise ValueError('data must be sorted by dteday to build the date index')
+
+    prefix_sums = {}
+    for column in PREFIX_COLUMNS:
+        prefix_sums[column] = np.concatenate(([0], np.cumsum(data[column].to_numpy(dtype='int64'))))
+    return {'dates': dates, 'prefix_sums': prefix_sums}
+
+
+# Extend the index with rows appended after the last indexed timestamp
+def append_to_date_index(index, data):
+    dates = data['dteday'].to_numpy()
+    if len(dates) == 0:
+        return index
+    if len(index['dates']) and dates[0] < index['dates'][-1]:
+        raise ValueError('appended rows must not be older than the indexed data')
+    if not data['dteday'].is_monotonic_increasing:
+        raise ValueError('data must be sorted by dteday to build the date index')
+
+    prefix_sums = {}
+    for column, sums in index['prefix_sums'].items():
+        running = sums[-1] + np.cumsum(data[column].to_numpy(dtype='int64'))
+        prefix_sums[column] = np.concatenate((sums, running))
+    return {'dates': np.concatenate((index['dates'], dates)), 'prefix_sums': prefix_sums}
+
+
+# Row positions [start, end) covering start_date up to and including every hour of end_date
+def range_bounds(index, start_date, end_date):
+    dates = index['dates']
+    start = dates.searchsorted(np.datetime64(pd.Timestamp(start_date)), side='left')
+    end = dates.searchsorted(np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1)), side='left')
+    return start, end
+
+
+def range_totals(index, start_date, end_date):
+    start, end = range_bounds(index, start_date, end_date)
+    return {column: int(sums[end] - sums[start]) for column, sums in index['prefix_sums'].items()}
+
+
+# Positional slice of the sorted frame, no boolean mask and no copy of the rows
+def slice_date_range(data, index, start_date, end_date):
+    start, end = range_bounds(index, start_date, end_date)
+    return data.iloc[start:end]
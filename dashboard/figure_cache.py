@@ -0,0 +1,89 @@
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import streamlit as st
+
+from instrumentation import instrumented
+
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+# Interactive panels kept, each holds only the small aggregated tables of its charts
+CHART_CACHE_ENTRIES = 512
+# Same output st.pyplot produces
+SAVEFIG_OPTIONS = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+
+
+# Least-recently-used store of rendered images, bounded by total size in bytes
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            images = self._entries.get(key)
+            if images is not None:
+                self._entries.move_to_end(key)
+            return images
+
+    def put(self, key, images):
+        size = sum(len(image) for image in images)
+        # An entry bigger than the whole budget would only evict everything else
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= sum(len(image) for image in self._entries.pop(key))
+            self._entries[key] = images
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= sum(len(image) for image in evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+
+# Rasterize and close the figure, nothing stays registered in pyplot afterwards
+@instrumented
+def figure_to_bytes(fig):
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, **SAVEFIG_OPTIONS)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def render_figures(draw, *args):
+    figures = draw(*args)
+    try:
+        return [figure_to_bytes(fig) for fig in figures]
+    finally:
+        for fig in figures:
+            plt.close(fig)
+
+
+# Altair charts of an interactive panel, keyed like the rendered images. Only the key is hashed,
+# the chart builder and its arguments are left out; every session gets its own unpickled copy.
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+def get_panel_charts(key, _chart, _args):
+    return list(_chart(*_args))
+
+
+def show_images(images):
+    for image in images:
+        st.image(image, use_column_width=True)
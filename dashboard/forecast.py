@@ -0,0 +1,292 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATA_PATH, hash_file, read_data, snapshot_parent, snapshot_path, write_atomic
+from partitions import PARTITION_ROOT, list_partitions, partitions_parent, partitions_version, read_partitions
+
+# Columns the forecast models read, the hour comes from dteday
+FORECAST_COLUMNS = ['dteday', 'season', 'holiday', 'weekday', 'workingday', 'weathersit',
+                    'temp', 'atemp', 'hum', 'windspeed', 'cnt']
+# Hours between the last known count and the forecast hour
+HORIZONS = {'hour_ahead': 1, 'day_ahead': 24}
+# Earlier counts every model sees besides the one at its own horizon
+LAG_HOURS = [24, 168]
+RIDGE_ALPHA = float(os.environ.get('DASHBOARD_FORECAST_ALPHA', '1.0'))
+# One file per data version, trained models survive a restart
+MODEL_DIR = os.environ.get('DASHBOARD_MODEL_DIR', './data/models')
+MODEL_FILES_KEPT = 4
+# Rows turned into features at a time, so training memory does not grow with the data
+CHUNK_ROWS = 100_000
+
+
+def _lags(horizon):
+    return [horizon] + [lag for lag in LAG_HOURS if lag != horizon]
+
+
+# log1p of cnt exactly `lag` hours before each timestamp, NaN where that hour is missing
+def _lagged_counts(dates, counts, at, lag):
+    target = at - np.timedelta64(lag, 'h')
+    positions = np.minimum(dates.searchsorted(target), len(dates) - 1)
+    return np.where(dates[positions] == target, np.log1p(counts[positions]), np.nan)
+
+
+# Features of rows [first, last), lags are looked up in the whole frame. Returns the features,
+# log1p(cnt) and a mask of the rows whose lags are all known.
+def design_matrix(data, horizon, first=0, last=None):
+    dates = data['dteday'].to_numpy()
+    counts = data['cnt'].to_numpy()
+    rows = data.iloc[first:last]
+    at = dates[first:last]
+    hour = rows['dteday'].dt.hour.to_numpy()
+    working = rows['workingday'].to_numpy()
+    features = np.column_stack([
+        np.ones(len(rows)),
+        *(rows['season'].to_numpy() == season for season in (2, 3, 4)),
+        rows['holiday'].to_numpy(),
+        *(rows['weekday'].to_numpy() == weekday for weekday in range(1, 7)),
+        *(rows['weathersit'].to_numpy() == weather for weather in (2, 3, 4)),
+        *(rows[column].to_numpy() for column in ('temp', 'atemp', 'hum', 'windspeed')),
+        # Commute peaks on working days, a midday peak on the others
+        *((hour == h) & (working == 1) for h in range(24)),
+        *((hour == h) & (working == 0) for h in range(24)),
+        *(_lagged_counts(dates, counts, at, lag) for lag in _lags(horizon)),
+    ]).astype('float64')
+    return features, np.log1p(counts[first:last]), ~np.isnan(features).any(axis=1)
+
+
+# X'X and X'y plus the rows [first, last), built chunk by chunk
+def _accumulate(data, horizon, first, last, xtx, xty, samples):
+    for start in range(first, last, CHUNK_ROWS):
+        features, target, known = design_matrix(data, horizon, start, min(start + CHUNK_ROWS, last))
+        features, target = features[known], target[known]
+        xtx = xtx + features.T @ features
+        xty = xty + features.T @ target
+        samples += len(target)
+    return xtx, xty, samples
+
+
+# Ridge solution from the accumulated moments, the intercept is not penalised
+def _ridge(xtx, xty, samples, alpha):
+    if not samples:
+        return np.full(len(xty), np.nan)
+    penalty = np.full(len(xty), alpha)
+    penalty[0] = 0
+    return np.linalg.solve(xtx + np.diag(penalty), xty)
+
+
+def _month_starts(dates):
+    return pd.date_range(pd.Timestamp(dates[0]).to_period('M').start_time, pd.Timestamp(dates[-1]),
+                         freq='MS').to_numpy()
+
+
+# Adds rows [first, len(data)) to the moments. Passing a month start solves the moments
+# gathered so far, which is the fit on every row before that month.
+def _extend(model, data):
+    horizon, alpha = model['horizon'], model['alpha']
+    xtx, xty, samples = model['xtx'], model['xty'], model['samples']
+    dates = data['dteday'].to_numpy()
+    origins = _month_starts(dates)[len(model['origins']):] if len(dates) else model['origins'][:0]
+    origin_coef = []
+    start = model['rows']
+    for bound in dates.searchsorted(origins):
+        xtx, xty, samples = _accumulate(data, horizon, start, bound, xtx, xty, samples)
+        origin_coef.append(_ridge(xtx, xty, samples, alpha))
+        start = bound
+    xtx, xty, samples = _accumulate(data, horizon, start, len(data), xtx, xty, samples)
+    return {
+        'horizon': horizon, 'alpha': alpha, 'rows': len(data), 'samples': samples,
+        'xtx': xtx, 'xty': xty, 'coef': _ridge(xtx, xty, samples, alpha),
+        'origins': np.concatenate((model['origins'], origins)),
+        'origin_coef': np.concatenate((model['origin_coef'], np.reshape(origin_coef, (-1, len(xty))))),
+    }
+
+
+# Ridge regression on log1p(cnt). Only X'X and X'y are kept, so new rows are added to them
+# and the small system is solved again; the result equals a fit on all rows. The fit on the
+# rows before every month start is kept as well, one coefficient row per month, for backtests.
+def train_model(data, horizon, alpha=RIDGE_ALPHA):
+    empty = pd.DataFrame({column: [] for column in FORECAST_COLUMNS}).astype({'dteday': 'datetime64[ns]'})
+    size = design_matrix(empty, horizon)[0].shape[1]
+    model = {'horizon': horizon, 'alpha': alpha, 'rows': 0, 'samples': 0,
+             'xtx': np.zeros((size, size)), 'xty': np.zeros(size),
+             'origins': np.array([], dtype='datetime64[ns]'), 'origin_coef': np.zeros((0, size))}
+    return _extend(model, data)
+
+
+def update_model(model, data):
+    if len(data) == model['rows']:
+        return model
+    if len(data) < model['rows']:
+        raise ValueError('data must extend the rows the model was trained on')
+    return _extend(model, data)
+
+
+def train_forecast(data, alpha=RIDGE_ALPHA):
+    return {name: train_model(data, horizon, alpha) for name, horizon in HORIZONS.items()}
+
+
+def update_forecast(forecast, data):
+    return {name: update_model(model, data) for name, model in forecast.items()}
+
+
+def model_path(version, root=MODEL_DIR):
+    return os.path.join(root, f'forecast-{version}.npz')
+
+
+# Only the newest few versions are kept, older ones are never asked for again
+def _prune_model_files(root):
+    paths = sorted((os.path.join(root, name) for name in os.listdir(root)
+                    if name.startswith('forecast-') and name.endswith('.npz')), key=os.path.getmtime)
+    for path in paths[:-MODEL_FILES_KEPT]:
+        os.remove(path)
+
+
+def save_forecast(forecast, version, root=MODEL_DIR):
+    path = model_path(version, root)
+    # The version is a content hash, an existing file already holds the same models
+    if os.path.exists(path):
+        return path
+    os.makedirs(root, exist_ok=True)
+    arrays = {f'{name}.{key}': np.asarray(value) for name, model in forecast.items() for key, value in model.items()}
+    write_atomic(path, lambda f: np.savez(f, **arrays))
+    _prune_model_files(root)
+    return path
+
+
+MODEL_FIELDS = {'horizon', 'alpha', 'rows', 'samples', 'xtx', 'xty', 'coef', 'origins', 'origin_coef'}
+
+
+# The models stored for a data version, None when there are none, they used another alpha
+# or were written by a version of this module that stored other fields
+def load_forecast(version, root=MODEL_DIR, alpha=RIDGE_ALPHA):
+    path = model_path(version, root)
+    if not os.path.exists(path):
+        return None
+    forecast = {}
+    with np.load(path) as arrays:
+        for key in arrays.files:
+            name, field = key.split('.', 1)
+            value = arrays[key]
+            forecast.setdefault(name, {})[field] = value.item() if value.ndim == 0 else value
+    if set(forecast) != set(HORIZONS) or any(set(model) != MODEL_FIELDS or model['alpha'] != alpha
+                                             for model in forecast.values()):
+        return None
+    return forecast
+
+
+# Stored models of this version, else the parent version's extended by the new rows, else a full fit.
+# parent is (parent version, parent rows) as recorded by append_snapshot.
+def load_or_train_forecast(data, version, parent=None, root=MODEL_DIR):
+    forecast = load_forecast(version, root)
+    if forecast is not None and all(model['rows'] == len(data) for model in forecast.values()):
+        return forecast
+    base = load_forecast(parent[0], root) if parent is not None else None
+    if base is not None and all(model['rows'] == parent[1] for model in base.values()):
+        return update_forecast(base, data)
+    return train_forecast(data)
+
+
+def _predict(model, data, first, last, backtest=False):
+    features, _, known = design_matrix(data, model['horizon'], first, last)
+    if backtest:
+        # Each hour by the fit on the rows before its month, nothing of that month was trained on
+        origin = model['origins'].searchsorted(data['dteday'].to_numpy()[first:last], side='right') - 1
+        known &= origin >= 0
+        coef = model['origin_coef'][np.maximum(origin, 0)]
+    else:
+        coef = model['coef']
+    with np.errstate(invalid='ignore'):
+        predicted = np.expm1((features * coef).sum(axis=1))
+    return np.where(known, np.clip(predicted, 0, None), np.nan)
+
+
+# Batch inference: every model's forecast for each stored hour of [start_date, end_date].
+# backtest=True gives rolling-origin forecasts (refit every month start), so their errors
+# are out of sample; none for the first stored month, there is nothing before it.
+def predict_range(forecast, data, start_date, end_date, backtest=False):
+    dates = data['dteday'].to_numpy()
+    first = dates.searchsorted(np.datetime64(pd.Timestamp(start_date)), side='left')
+    last = dates.searchsorted(np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1)), side='left')
+    predictions = {'dteday': dates[first:last], 'cnt': data['cnt'].to_numpy()[first:last]}
+    for name, model in forecast.items():
+        predictions[name] = np.concatenate([np.array([])] + [
+            _predict(model, data, start, min(start + CHUNK_ROWS, last), backtest)
+            for start in range(first, last, CHUNK_ROWS)
+        ])
+    return pd.DataFrame(predictions)
+
+
+# The rows predict_range and forecast_next_day read for one range: the range with the lag history
+# before it, and the last stored week. A panel worker is sent these instead of the whole history.
+def forecast_rows(data, start_date, end_date):
+    dates = data['dteday']
+    history = pd.Timedelta(hours=max(LAG_HOURS))
+    first = dates.searchsorted(pd.Timestamp(start_date) - history, side='left')
+    last = dates.searchsorted(pd.Timestamp(end_date) + pd.Timedelta(days=1), side='left')
+    tail = dates.searchsorted(dates.iloc[-1] - history, side='left') if len(data) else 0
+    if tail <= last:
+        return data.iloc[first:][FORECAST_COLUMNS]
+    return pd.concat([data.iloc[first:last], data.iloc[tail:]], ignore_index=True)[FORECAST_COLUMNS]
+
+
+# Day-ahead forecast of the 24 hours after the last stored hour. Weather is not known ahead,
+# the same hour of the previous day (or the last hour stored before it) is assumed; holidays are
+# not known either and assumed none.
+def forecast_next_day(forecast, data):
+    if len(data) == 0:
+        return pd.DataFrame({'dteday': pd.Series(dtype='datetime64[ns]'), 'day_ahead': pd.Series(dtype='float64')})
+    last = data['dteday'].iloc[-1]
+    history = data.iloc[data['dteday'].searchsorted(last - pd.Timedelta(hours=max(LAG_HOURS))):][FORECAST_COLUMNS]
+    dates = pd.date_range(last + pd.Timedelta(hours=1), periods=24, freq='h')
+    previous = history.set_index('dteday').reindex(dates - pd.Timedelta(hours=24), method='ffill')
+    weekday = (dates.dayofweek.to_numpy() + 1) % 7
+    future = pd.DataFrame({
+        'dteday': dates,
+        'season': previous['season'].to_numpy(),
+        'holiday': 0,
+        'weekday': weekday,
+        'workingday': ((weekday >= 1) & (weekday <= 5)).astype('int8'),
+        'weathersit': previous['weathersit'].to_numpy(),
+        **{column: previous[column].to_numpy() for column in ('temp', 'atemp', 'hum', 'windspeed')},
+        'cnt': 0,
+    })
+    combined = pd.concat([history, future], ignore_index=True)
+    return pd.DataFrame({'dteday': dates, 'day_ahead': _predict(forecast['day_ahead'], combined, len(history), None)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch forecasts of hourly rentals from the stored (or newly trained) models.')
+    parser.add_argument('--data', default=DATA_PATH, help='cleaned dataset CSV')
+    parser.add_argument('--city', help='read the monthly partitions of this city instead of --data')
+    parser.add_argument('--root', default=PARTITION_ROOT, help='partition root directory, used with --city')
+    parser.add_argument('--start', help='first day to predict (YYYY-MM-DD), default the first stored day')
+    parser.add_argument('--end', help='last day to predict (YYYY-MM-DD), default the last stored day')
+    parser.add_argument('--backtest', action='store_true',
+                        help='predict every month with the fit on the rows before it, for out-of-sample errors')
+    parser.add_argument('--next-day', action='store_true', help='forecast the 24 hours after the last stored hour instead')
+    parser.add_argument('--output', required=True, help='CSV file for the forecasts')
+    args = parser.parse_args()
+
+    if args.city:
+        version = partitions_version(list_partitions(args.root, args.city))
+        data, parent = read_partitions(args.root, args.city, FORECAST_COLUMNS), partitions_parent(args.root, args.city, version)
+    else:
+        version = hash_file(args.data)
+        data, parent = read_data(FORECAST_COLUMNS, args.data, version), snapshot_parent(snapshot_path(args.data))
+    forecast = load_or_train_forecast(data, version, parent)
+    save_forecast(forecast, version)
+
+    if args.next_day:
+        forecasts = forecast_next_day(forecast, data)
+    else:
+        forecasts = predict_range(forecast, data, args.start or data['dteday'].iloc[0].date(),
+                                  args.end or data['dteday'].iloc[-1].date(), args.backtest)
+    forecasts.to_csv(args.output, index=False, date_format='%Y-%m-%d %H:%M:%S')
+    print(f'{len(forecasts)} baris prakiraan ditulis ke {args.output}.')
+
+
+if __name__ == '__main__':
+    main()
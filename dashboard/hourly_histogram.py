@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+HOURS = 24
+MAX_OUTLIERS_PER_HOUR = 20
+# Counts before every year start are kept, a range adds the days between a checkpoint and its ends.
+# A monthly checkpoint (24 x every cnt value) would be several times the size of the month's rows.
+CHECKPOINT_FREQ = 'YS'
+
+
+# The value of every stored hour, one row per day and -1 for an hour without data
+def _day_values(data, column):
+    dates = data['dteday'].dt.normalize().to_numpy()
+    days, day_codes = np.unique(dates, return_inverse=True)
+    day_values = np.full((len(days), HOURS), -1, dtype='int32')
+    day_values[day_codes, data['dteday'].dt.hour.to_numpy()] = data[column].to_numpy()
+    return days, day_values
+
+
+# Hour x value counts of some day rows, every integer value is its own bucket
+def _hour_value_counts(day_values, size):
+    hours = np.broadcast_to(np.arange(HOURS), day_values.shape)
+    stored = day_values >= 0
+    codes = hours[stored] * size + day_values[stored]
+    return np.bincount(codes, minlength=HOURS * size).reshape(HOURS, size).astype('int32')
+
+
+# Checkpoint dates for stored days: every year start from the first day's year on
+def year_starts(days):
+    return pd.date_range(pd.Timestamp(days[0]).to_period('Y').start_time, pd.Timestamp(days[-1]),
+                         freq=CHECKPOINT_FREQ).to_numpy()
+
+
+# Exact per-hour counts of every integer value of one column (cnt): the counts of all days before
+# each year start, plus the value of every stored hour for the days between a checkpoint and a range end
+def build_hourly_histogram(data, column='cnt'):
+    size = int(data[column].max()) + 1 if len(data) else 1
+    days, day_values = _day_values(data, column)
+    checkpoints = year_starts(days) if len(days) else np.array([], dtype='datetime64[ns]')
+    positions = days.searchsorted(checkpoints)
+    prefix = np.zeros((len(checkpoints), HOURS, size), dtype='int32')
+    for index in range(1, len(checkpoints)):
+        prefix[index] = prefix[index - 1] + _hour_value_counts(day_values[positions[index - 1]:positions[index]], size)
+    return {'column': column, 'days': days, 'day_values': day_values, 'checkpoints': checkpoints, 'prefix': prefix}
+
+
+# New hours fill in their days, years that are complete now get their checkpoint.
+# A value above every stored one widens the buckets, the stored counts keep their positions.
+def append_to_hourly_histogram(histogram, data):
+    if len(data) == 0:
+        return histogram
+    days, day_values = _day_values(data, histogram['column'])
+    old_days, old_values = histogram['days'], histogram['day_values']
+    if len(old_days) and days[0] < old_days[-1]:
+        raise ValueError('appended rows must not be older than the histogram data')
+    if len(old_days) and days[0] == old_days[-1]:
+        last_day = np.where(day_values[0] >= 0, day_values[0], old_values[-1])
+        days = np.concatenate((old_days, days[1:]))
+        day_values = np.concatenate((old_values[:-1], last_day[None], day_values[1:]))
+    else:
+        days = np.concatenate((old_days, days))
+        day_values = np.concatenate((old_values, day_values))
+
+    checkpoints, prefix = histogram['checkpoints'], histogram['prefix']
+    size = max(prefix.shape[-1], int(day_values.max()) + 1)
+    if size > prefix.shape[-1]:
+        prefix = np.pad(prefix, ((0, 0), (0, 0), (0, size - prefix.shape[-1])))
+    new_checkpoints = year_starts(days)[len(checkpoints):]
+    if len(new_checkpoints):
+        if not len(checkpoints):
+            checkpoints, prefix = new_checkpoints[:1], np.zeros((1,) + prefix.shape[1:], dtype='int32')
+            new_checkpoints = new_checkpoints[1:]
+        added = [prefix[-1]]
+        for start, end in zip(np.concatenate((checkpoints[-1:], new_checkpoints[:-1])), new_checkpoints):
+            rows = day_values[days.searchsorted(start):days.searchsorted(end)]
+            added.append(added[-1] + _hour_value_counts(rows, prefix.shape[-1]))
+        checkpoints = np.concatenate((checkpoints, new_checkpoints))
+        prefix = np.concatenate((prefix, np.stack(added[1:])))
+    return {'column': histogram['column'], 'days': days, 'day_values': day_values,
+            'checkpoints': checkpoints, 'prefix': prefix}
+
+
+# Counts of every day before `at`: the checkpoint at or before it plus at most a year of days
+def _counts_before(histogram, at):
+    checkpoints, days, prefix = histogram['checkpoints'], histogram['days'], histogram['prefix']
+    index = checkpoints.searchsorted(at, side='right') - 1
+    if index < 0:
+        return np.zeros(prefix.shape[1:], dtype='int32')
+    rows = histogram['day_values'][days.searchsorted(checkpoints[index]):days.searchsorted(at)]
+    return prefix[index] + _hour_value_counts(rows, prefix.shape[-1])
+
+
+def range_histogram(histogram, start_date, end_date):
+    start = np.datetime64(pd.Timestamp(start_date).normalize())
+    end = np.datetime64(pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1))
+    return {'counts': _counts_before(histogram, end) - _counts_before(histogram, start)}
+
+
+# Value at sorted position k (0-based) of the rows counted in one hour
+def _order_statistic(cumulative, k):
+    return np.searchsorted(cumulative, k, side='right')
+
+
+# Same linear interpolation as np.percentile over the rows themselves
+def _quantile(cumulative, q):
+    position = q * (cumulative[-1] - 1)
+    low, high = int(np.floor(position)), int(np.ceil(position))
+    low_value, high_value = _order_statistic(cumulative, low), _order_statistic(cumulative, high)
+    return low_value + (position - low) * (high_value - low_value)
+
+
+# Matplotlib bxp() statistics per hour, exactly what cbook.boxplot_stats gives for the rows.
+# Whiskers end at observed values, outliers are at most max_outliers distinct values.
+def boxplot_stats(range_hist, max_outliers=MAX_OUTLIERS_PER_HOUR):
+    stats = []
+    for hour, counts in enumerate(range_hist['counts']):
+        if counts.sum() == 0:
+            continue
+        cumulative = np.cumsum(counts)
+        q1, median, q3 = (_quantile(cumulative, q) for q in (0.25, 0.5, 0.75))
+        low_fence, high_fence = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+
+        observed = np.flatnonzero(counts)
+        inside = observed[(observed >= low_fence) & (observed <= high_fence)]
+        whislo = inside.min() if len(inside) else q1
+        whishi = inside.max() if len(inside) else q3
+
+        fliers = observed[(observed < low_fence) | (observed > high_fence)]
+        if len(fliers) > max_outliers:
+            # Keep the most extreme ones, they are what the outlier markers are for
+            order = np.argsort(-np.abs(fliers - median))
+            fliers = np.sort(fliers[order[:max_outliers]])
+
+        stats.append({
+            'label': hour,
+            'q1': q1,
+            'med': median,
+            'q3': q3,
+            'whislo': min(whislo, q1),
+            'whishi': max(whishi, q3),
+            'fliers': fliers,
+        })
+    return stats
@@ -0,0 +1,116 @@
+import argparse
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from data_loader import DATA_PATH, append_snapshot, hash_file, snapshot_path, snapshot_version
+from partitions import PARTITION_ROOT, append_partition_rows, last_partition_timestamp
+
+# Raw hourly records, same layout as data/hour.csv
+RAW_COLUMNS = ['instant', 'dteday', 'season', 'yr', 'mnth', 'hr', 'holiday', 'weekday', 'workingday',
+               'weathersit', 'temp', 'atemp', 'hum', 'windspeed', 'casual', 'registered', 'cnt']
+# Column order of data/combined_data_clean.csv
+CLEAN_COLUMNS = ['instant', 'dteday', 'season', 'holiday', 'weekday', 'workingday', 'weathersit',
+                 'temp', 'atemp', 'hum', 'windspeed', 'casual', 'registered', 'cnt']
+
+# Allowed values per column, as documented for the Bike Sharing Dataset
+VALUE_RANGES = {
+    'hr': (0, 23),
+    'season': (1, 4),
+    'holiday': (0, 1),
+    'weekday': (0, 6),
+    'workingday': (0, 1),
+    'weathersit': (1, 4),
+    'temp': (0, 1),
+    'atemp': (0, 1),
+    'hum': (0, 1),
+    'windspeed': (0, 1),
+    'casual': (0, None),
+    'registered': (0, None),
+    'cnt': (0, None),
+}
+
+
+# Same cleaning as the notebook: drop rows without an hour, fold hr into dteday, drop hr/mnth/yr
+def clean_hourly_rows(raw):
+    missing = [column for column in RAW_COLUMNS if column not in raw.columns]
+    if missing:
+        raise ValueError(f'missing columns: {", ".join(missing)}')
+
+    rows = raw[RAW_COLUMNS].dropna(subset=['hr'])
+    null_columns = rows.columns[rows.isna().any()].tolist()
+    if null_columns:
+        raise ValueError(f'empty values in: {", ".join(null_columns)}')
+
+    for column, (low, high) in VALUE_RANGES.items():
+        values = rows[column]
+        if (values < low).any() or (high is not None and (values > high).any()):
+            raise ValueError(f'{column} outside the range {low}..{high}')
+    if (rows['casual'] + rows['registered'] != rows['cnt']).any():
+        raise ValueError('cnt must equal casual + registered')
+
+    dteday = pd.to_datetime(rows['dteday']).dt.normalize() + pd.to_timedelta(rows['hr'], unit='h')
+    clean = rows.drop(columns=['hr', 'mnth', 'yr']).assign(dteday=dteday)[CLEAN_COLUMNS]
+    return clean.sort_values('dteday', kind='stable', ignore_index=True)
+
+
+def _last_timestamp(path):
+    snapshot = snapshot_path(path)
+    if os.path.exists(snapshot):
+        dates = feather.read_table(snapshot, columns=['dteday'], memory_map=True)['dteday']
+        if len(dates):
+            return pd.Timestamp(dates[-1].as_py())
+    return pd.to_datetime(pd.read_csv(path, usecols=['dteday'])['dteday']).max()
+
+
+def _new_rows(clean, last_timestamp):
+    new_rows = clean if last_timestamp is None else clean[clean['dteday'] > last_timestamp]
+    if new_rows['dteday'].duplicated().any():
+        raise ValueError('duplicate timestamps in the new rows')
+    return new_rows
+
+
+# Validate, clean and append only the rows newer than what is stored, then extend the snapshot
+def append_hourly_rows(raw, path=DATA_PATH):
+    new_rows = _new_rows(clean_hourly_rows(raw), _last_timestamp(path))
+    if new_rows.empty:
+        return new_rows
+
+    parent_version = snapshot_version(snapshot_path(path))
+    if parent_version != hash_file(path):
+        parent_version = None
+    new_rows.to_csv(path, mode='a', header=False, index=False, date_format='%Y-%m-%d %H:%M:%S')
+    append_snapshot(new_rows, path, parent_version=parent_version)
+    return new_rows
+
+
+# Same for the monthly partitions of one city, only the months of the new rows are rewritten
+def append_city_rows(raw, city, root=PARTITION_ROOT):
+    new_rows = _new_rows(clean_hourly_rows(raw), last_partition_timestamp(root, city))
+    if not new_rows.empty:
+        append_partition_rows(new_rows, city, root)
+    return new_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Append new hourly records (hour.csv format) to the cleaned dataset.')
+    parser.add_argument('files', nargs='+', help='CSV files with new hourly rows')
+    parser.add_argument('--data', default=DATA_PATH, help='cleaned dataset to append to')
+    parser.add_argument('--city', help='append to the monthly partitions of this city instead of --data')
+    parser.add_argument('--root', default=PARTITION_ROOT, help='partition root directory, used with --city')
+    args = parser.parse_args()
+
+    raw = pd.concat([pd.read_csv(file) for file in args.files], ignore_index=True)
+    if args.city:
+        new_rows = append_city_rows(raw, args.city, args.root)
+    else:
+        new_rows = append_hourly_rows(raw, args.data)
+    if new_rows.empty:
+        print('Tidak ada data baru.')
+    else:
+        print(f'{len(new_rows)} baris baru ditambahkan ({new_rows["dteday"].min()} - {new_rows["dteday"].max()}).')
+
+
+if __name__ == '__main__':
+    main()
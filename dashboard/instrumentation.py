@@ -0,0 +1,138 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Peak allocation needs tracemalloc, which slows every allocation down, so it is opt-in
+TRACE_MEMORY = os.environ.get('DASHBOARD_TRACE_MEMORY', '') not in ('', '0')
+# Only this machine can scrape the metrics unless another interface is asked for
+METRICS_HOST = os.environ.get('DASHBOARD_METRICS_HOST', '127.0.0.1')
+
+# Called by the dashboard and by every panel worker, importing this module starts nothing
+def start_memory_tracing():
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+# List the instrumented functions of the current rerun append to, None when nothing is recording
+_records = contextvars.ContextVar('instrumentation_records', default=None)
+# Hourly rows of the selected range, what every call of the rerun answers for. The arguments
+# themselves are cubes, histograms or index slices whose length says nothing about that.
+_selected_rows = contextvars.ContextVar('instrumentation_selected_rows', default=None)
+
+
+# Record wall time, CPU time of the calling thread, peak allocation and the rows of the selected
+# range for every call made inside recording(). Outside of it the function runs untouched.
+def instrumented(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        records = _records.get()
+        if records is None:
+            return func(*args, **kwargs)
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Shared by all threads, with concurrent sessions this is an upper bound
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            records.append({
+                'function': func.__name__,
+                'wall_seconds': time.perf_counter() - wall,
+                'cpu_seconds': time.thread_time() - cpu,
+                'peak_alloc_bytes': tracemalloc.get_traced_memory()[1] - start_memory if tracing else None,
+                'rows': _selected_rows.get(),
+            })
+    return wrapper
+
+
+@contextlib.contextmanager
+def recording(rows=None):
+    records = []
+    token = _records.set(records)
+    rows_token = _selected_rows.set(rows)
+    try:
+        yield records
+    finally:
+        _selected_rows.reset(rows_token)
+        _records.reset(token)
+
+
+# Running totals per (panel, function) for the Prometheus endpoint
+_totals = {}
+_totals_lock = threading.Lock()
+
+
+def publish(records):
+    if not records:
+        return
+    logger.info(json.dumps({'event': 'dashboard_rerun', 'records': records}))
+    with _totals_lock:
+        for record in records:
+            totals = _totals.setdefault((record.get('panel', ''), record['function']), {
+                'count': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_alloc_bytes': None, 'rows': None,
+            })
+            totals['count'] += 1
+            totals['wall_seconds'] += record['wall_seconds']
+            totals['cpu_seconds'] += record['cpu_seconds']
+            totals['peak_alloc_bytes'] = record['peak_alloc_bytes']
+            totals['rows'] = record['rows']
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+# Prometheus text exposition format
+def render_metrics():
+    metrics = [
+        ('dashboard_function_calls_total', 'counter', 'Instrumented calls', 'count'),
+        ('dashboard_function_wall_seconds_total', 'counter', 'Wall time spent in the function', 'wall_seconds'),
+        ('dashboard_function_cpu_seconds_total', 'counter', 'CPU time spent in the function', 'cpu_seconds'),
+        ('dashboard_function_peak_alloc_bytes', 'gauge', 'Peak allocation of the last call', 'peak_alloc_bytes'),
+        ('dashboard_function_rows', 'gauge', 'Hourly rows of the range selected for the last call', 'rows'),
+    ]
+    with _totals_lock:
+        totals = {key: dict(value) for key, value in _totals.items()}
+
+    lines = []
+    for name, kind, help_text, field in metrics:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (panel, function), values in sorted(totals.items()):
+            if values[field] is not None:
+                lines.append(f'{name}{{panel="{_label(panel)}",function="{_label(function)}"}} {values[field]}')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host=METRICS_HOST):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
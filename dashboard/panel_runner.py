@@ -0,0 +1,67 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import streamlit as st
+
+from figure_cache import get_figure_cache, render_figures
+from instrumentation import recording, start_memory_tracing
+
+logger = logging.getLogger(__name__)
+
+# 0 or 1 keeps rendering in the Streamlit thread, more spawns that many panel processes
+PANEL_WORKERS = int(os.environ.get('DASHBOARD_PANEL_WORKERS', '0'))
+
+
+# Spawned rather than forked, forking the threaded Streamlit server is not safe.
+# Every worker has its own pyplot state, so panels never share a figure.
+@st.cache_resource(show_spinner=False)
+def get_panel_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=start_memory_tracing)
+
+
+# Runs in the Streamlit thread or in a worker, the records travel back with the images
+def _render_job(rows, draw, *args):
+    with recording(rows) as records:
+        images = render_figures(draw, *args)
+    return images, records
+
+
+def _render_serial(jobs, keys, rows):
+    return {key: _render_job(rows, *jobs[key]) for key in keys}
+
+
+def _render_parallel(jobs, keys, workers, rows):
+    pool = get_panel_pool(workers)
+    try:
+        futures = {key: pool.submit(_render_job, rows, *jobs[key]) for key in keys}
+        return {key: future.result() for key, future in futures.items()}
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory), drop the pool and finish in this process
+        logger.exception('Panel worker pool broke, rendering panels serially')
+        get_panel_pool.clear()
+        return _render_serial(jobs, keys, rows)
+
+
+# jobs maps a figure cache key to (draw, *args), returns the PNG images for every key.
+# Timings of the comparison_*/plot_* calls are appended to records, tagged with the panel
+# and with rows, the hourly rows of the selected range.
+def render_panels(jobs, workers=PANEL_WORKERS, records=None, rows=None):
+    cache = get_figure_cache()
+    images = {key: cache.get(key) for key in jobs}
+    missing = [key for key, value in images.items() if value is None]
+
+    if workers > 1 and len(missing) > 1:
+        rendered = _render_parallel(jobs, missing, workers, rows)
+    else:
+        rendered = _render_serial(jobs, missing, rows)
+
+    for key, (value, panel_records) in rendered.items():
+        cache.put(key, value)
+        images[key] = value
+        if records is not None:
+            records.extend({'panel': key[0], **record} for record in panel_records)
+    return images
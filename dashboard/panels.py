@@ -0,0 +1,421 @@
+import seaborn as sns
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+from instrumentation import instrumented
+from analytics import (
+    comparison_data_holiday_and_nonholiday,
+    comparison_holiday_average,
+    comparison_seasonal_rentals,
+    comparison_weather_conditions,
+    comparison_temperature,
+    comparison_yearly_trends,
+    comparison_wind_speed,
+    comparison_registered_vs_casual,
+    comparison_hourly_rentals,
+    comparison_rolling_anomalies,
+    comparison_forecast,
+    daily_series,
+)
+from partitions import city_monthly_totals
+
+# Figures are built without pyplot and drawn through their own axes: sessions render panels
+# in their own threads, and pyplot's current figure is shared by all of them
+
+# Function to plot average rentals for holidays vs non-holidays
+@instrumented
+def plot_holiday_comparison(mean_rentals_by_holiday):
+    # Plotting within Streamlit
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    color = 'tab:red'
+    sns.barplot(x='holiday', y='cnt', data=mean_rentals_by_holiday, color=color, ax=ax, alpha=0.6)
+    ax.set_title('Perbandingan Rata-Rata Penyewaan Sepeda: Hari Libur vs Bukan Hari Libur')
+    ax.set_xlabel('Jenis Hari')
+    ax.set_ylabel('Rata-Rata Penyewaan Sepeda')
+    ax.set_xticklabels(['Non-Holiday', 'Holiday'])
+    return fig
+
+# Function to plot average bike rentals by year and month for holiday vs non-holiday
+@instrumented
+def plot_monthly_rentals(data):
+    fig = Figure(figsize=(15, 8))  # Consider making the figure larger
+    ax = fig.subplots()
+    sns.barplot(x='year_month', y='cnt_mean', hue='holiday', data=data, palette='coolwarm', ax=ax)
+    ax.set_title('Rata Rata Penyewaan Sepeda Berdasarkan Tahun dan Bulan: Hari Libur vs Bukan Hari Libur')
+    ax.set_xlabel('Year-Month (YYYY-MM)')
+    ax.set_ylabel('Rata-Rata Penyewaan Sepeda')
+    ax.tick_params(axis='x', labelrotation=90)  # Rotate the x-axis labels for better readability
+    ax.legend(title='Holiday', loc='upper left', bbox_to_anchor=(1, 1))  # Move the legend outside of the plot
+    ax.grid(axis='y', linestyle='--', alpha=0.7)  # Add horizontal gridlines for easier reading
+    fig.tight_layout()  # Adjust layout
+    return fig
+    
+    
+@instrumented
+def plot_seasonal_rentals(data):
+    # Plotting Total and Average Rentals by Season
+    season_labels = ['Musim Dingin', 'Musim Semi', 'Musim Panas', 'Musim Gugur']
+    unique_seasons = data['season'].unique()
+    matched_labels = season_labels[:len(unique_seasons)]
+    fig = Figure(figsize=(10, 6))
+    ax1 = fig.subplots()
+
+    def millions_formatter(x, pos):
+        return f'{int(x)}'
+
+    color = 'tab:red'
+    ax1.set_xlabel('Musim')
+    ax1.set_ylabel('Total Rental', color=color)
+    ax1.bar(data['season'], data['Total Rentals'], color=color, alpha=0.6, label='Total Rentals')
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax1.yaxis.set_major_formatter(FuncFormatter(millions_formatter))
+
+    ax2 = ax1.twinx() # This is for plotting average rentals on the same plot
+    color = 'tab:blue'
+    ax2.set_ylabel('Rata-rata Rental', color=color)  # we already handled the x-label with ax1
+    ax2.plot(data['season'], data['Average Rentals'], color=color, marker='o', label='Average Rentals')
+    ax2.tick_params(axis='y', labelcolor=color)
+
+    fig.tight_layout()  # otherwise the right y-label is slightly clipped
+    ax2.set_title('Penyewaan Sepeda: Total vs Rata-rata per Musim')
+    ax2.set_xticks(unique_seasons, labels=matched_labels)
+    return fig
+    
+    
+@instrumented
+def plot_weather_correlation(weather_sum, weather_mean):
+    def autopct_format(values):
+        def my_autopct(pct):
+            total = sum(values)
+            val = int(round(pct*total/100.0))
+            return '{p:.2f}% ({v:d})'.format(p=pct,v=val)
+        return my_autopct
+
+    # Plotting the sum counts of bike rentals in a pie chart
+    fig = Figure(figsize=(20, 8))
+
+    # Plot for sum
+    ax = fig.add_subplot(1, 3, 1)
+    patches, texts, autotexts = ax.pie(weather_sum['cnt'],
+            autopct=autopct_format(weather_sum['cnt']), startangle=60)
+    ax.set_title('Total Penyewaan Sepeda Berdasarkan Kondisi Cuaca')
+    ax.axis('equal')
+
+    # Plot for mean
+    ax = fig.add_subplot(1, 3, 2)
+    patches, texts, autotexts = ax.pie(weather_mean['cnt'],
+            autopct=autopct_format(weather_mean['cnt']), startangle=200)
+    ax.set_title('Rata Rata Penyewaan Sepeda Berdasarkan Kondisi Cuaca')
+    ax.axis('equal')
+
+    # Adjust legend
+    ax.legend(patches, weather_sum['weathersit_descriptive'], loc='center left', bbox_to_anchor=(-0.5, 0))
+
+    # Show the plots
+    fig.tight_layout()
+    return fig
+
+
+@instrumented
+def plot_correlation_temperature(correlation_matrix, comparison_temp_category, comparison_atemp_category):
+    heatmap_fig = Figure(figsize=(8, 6))
+    ax = heatmap_fig.subplots()
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt=".2f", ax=ax)
+    ax.set_title('Korelasi antara Variabel Suhu, Sensasi Suhu, dan Jumlah Rental')
+
+    category_fig = Figure(figsize=(20, 8))
+    ax = category_fig.add_subplot(1, 2, 1)
+    sns.barplot(x='temp_category', y='cnt_sum', data=comparison_temp_category, palette='coolwarm', ax=ax)
+    ax.set_title('Total Penyewaan Sepeda berdasarkan Kategori Suhu')
+    ax.set_xlabel('Kategori Suhu')
+    ax.set_ylabel('Total Rentals')
+
+    ax = category_fig.add_subplot(1, 2, 2)
+    sns.barplot(x='atemp_category', y='cnt_sum', data=comparison_atemp_category, palette='coolwarm', ax=ax)
+    ax.set_title('Total Penyewaan Sepeda berdasarkan Kategori Sensasi Suhu')
+    ax.set_xlabel('Kategori Sensasi Suhu')
+    ax.set_ylabel('Total Rental')
+    return heatmap_fig, category_fig
+
+@instrumented
+def plot_yearly_trends(monthly_rentals):
+    fig = Figure(figsize=(14, 8))
+    ax1 = fig.subplots()
+
+    # Assuming 'Total Rentals' is indexed by a MultiIndex of (year, month), we'll first need to reset it for plotting
+    monthly_rentals_reset = monthly_rentals.reset_index()  # This converts 'Year' and 'Month' from MultiIndex to columns
+    monthly_rentals_reset['Year-Month'] = monthly_rentals_reset['Year'].astype(str) + '-' + monthly_rentals_reset['Month'].astype(str)
+
+    # Bar chart
+    ax1.bar(monthly_rentals_reset['Year-Month'], monthly_rentals_reset['Total Rentals'], color='lightblue', label='Total Rentals', width=0.4)
+
+    # Creating ax2 for the line chart using the same x-axis but a different y-axis
+    ax2 = ax1.twinx()
+    ax2.plot(monthly_rentals_reset['Year-Month'], monthly_rentals_reset['Total Rentals'], color='green', label='Trend', marker='o', linewidth=2)
+
+    # Titles and labels
+    ax1.set_xlabel('Year-Month (YYYY-MM)')
+    ax1.set_ylabel('Total Rentals', color='blue')
+    ax2.set_ylabel('Trend', color='green')
+    ax1.set_title('Bike Rentals: Total and Trend Over Time')
+    ax1.tick_params(axis='x', rotation=45)
+
+    # Legend
+    lines, labels = ax1.get_legend_handles_labels()
+    lines2, labels2 = ax2.get_legend_handles_labels()
+    ax2.legend(lines + lines2, labels + labels2, loc='upper left')
+
+    fig.tight_layout()
+    return fig
+
+
+@instrumented
+def plot_wind_speed_effect(correlation_wind_count, windspeed_effect):
+    heatmap_fig = Figure(figsize=(8, 6))
+    ax = heatmap_fig.subplots()
+    sns.heatmap(correlation_wind_count, annot=True, cmap='coolwarm', fmt=".2f", ax=ax)
+    ax.set_title('Korelasi antara Kecepatan Angin dan Jumlah Rental')
+
+    category_fig = Figure(figsize=(8, 6))
+    ax = category_fig.subplots()
+    sns.barplot(x='windspeed_category', y='cnt', data=windspeed_effect, palette='coolwarm', ax=ax)
+    ax.set_title('Rata-Rata Penyewaan Sepeda berdasarkan Kategori Kecepatan Angin')
+    ax.set_xlabel('Kategori Kecepatan Angin')
+    ax.set_ylabel('Rata-Rata Rental')
+    return heatmap_fig, category_fig
+
+
+@instrumented
+def plot_registered_vs_casual(user_comparison_melted):
+    fig = Figure(figsize=(15, 7))
+    ax = fig.subplots()
+
+    # Create the bar plot
+    sns.barplot(x='month', y='Count', hue='User_Type', data=user_comparison_melted, ax=ax)
+
+    # Set the title and labels
+    ax.set_title('Bike Rentals: Casual vs. Registered Users')
+    ax.set_xlabel('Bulan')
+    ax.set_ylabel('Total Pengguna')
+    ax.legend(title='User Type')
+    return fig
+
+@instrumented
+def plot_hourly_rentals(hourly_box_stats, average_hourly_user):
+    # Boxes are drawn from precomputed per-hour statistics, so the cost does not depend on the row count
+    boxplot_fig = Figure(figsize=(12,6))
+    boxplot_hour = boxplot_fig.subplots()
+    positions = range(len(hourly_box_stats))
+    boxes = boxplot_hour.bxp(hourly_box_stats, positions=positions, patch_artist=True,
+                             medianprops={'color': 'black'},
+                             flierprops={'marker': 'd', 'markersize': 4, 'markerfacecolor': 'gray', 'markeredgecolor': 'gray'})
+    for box, color in zip(boxes['boxes'], sns.color_palette('coolwarm', len(hourly_box_stats))):
+        box.set_facecolor(color)
+    boxplot_hour.set_xticks(list(positions), [stats['label'] for stats in hourly_box_stats])
+    boxplot_hour.set(xlabel ="Hour", ylabel = "Total User", title ='Distribution of Bike Rentals Per Hour')
+
+    summary_fig = Figure(figsize=(18, 6))
+
+   # Total Rentals (Sum & Mean) per Hour
+    ax1 = summary_fig.add_subplot(1, 3, 1)
+    sns.barplot(x='hour', y='cnt_sum', data=average_hourly_user, color='skyblue', label='Total Sum', ax=ax1)
+    ax1.set_xlabel('Jam dalam Sehari')
+    ax1.set_ylabel('Total Rentals (Jumlah)')
+    ax1.set_title('Total Rental (Jumlah dan Rata-Rata) per Jam')
+
+    # Create a second y-axis for mean values
+    ax2 = ax1.twinx()
+    sns.lineplot(x='hour', y='cnt_mean', data=average_hourly_user, marker='o', color='orange', label='Total Mean', ax=ax2)
+    ax2.set_ylabel('Total Rental (Rata - Rata)')
+    ax2.set_ylim(0, average_hourly_user['cnt_mean'].max() * 1.1)  # Adjust the scale for visibility
+
+    # Add legend for the first subplot
+    h1, l1 = ax1.get_legend_handles_labels()
+    h2, l2 = ax2.get_legend_handles_labels()
+    ax1.legend(h1+h2, l1+l2, loc='upper left')
+
+    # Casual Rentals (Sum & Mean) per Hour
+    ax3 = summary_fig.add_subplot(1, 3, 2)
+    sns.barplot(x='hour', y='casual_sum', data=average_hourly_user, color='lightgreen', label='Casual Sum', ax=ax3)
+    ax3.set_xlabel('Jam dalam Sehari')
+    ax3.set_ylabel('Casual Rentals (Jumlah)')
+    ax3.set_title('Casual Rentals (Jumlah dan Rata-rata) per Jam')
+
+    # Create a second y-axis for mean values
+    ax4 = ax3.twinx()
+    sns.lineplot(x='hour', y='casual_mean', data=average_hourly_user, marker='o', color='darkgreen', label='Casual Mean', ax=ax4)
+    ax4.set_ylabel('Casual Rentals (Rata-rata)')
+    ax4.set_ylim(0, average_hourly_user['casual_mean'].max() * 1.1)  # Adjust the scale for visibility
+
+    # Add legend for the second subplot
+    h3, l3 = ax3.get_legend_handles_labels()
+    h4, l4 = ax4.get_legend_handles_labels()
+    ax3.legend(h3+h4, l3+l4, loc='upper left')
+
+    # Add legend for the second subplot
+    h3, l3 = ax3.get_legend_handles_labels()
+    h4, l4 = ax4.get_legend_handles_labels()
+    ax3.legend(h3+h4, l3+l4, loc='upper left')
+
+    # Registered Rentals (Sum & Mean) per Hour
+    ax5 = summary_fig.add_subplot(1, 3, 3)
+    sns.barplot(x='hour', y='registered_sum', data=average_hourly_user, color='thistle', label='Registered Sum', ax=ax5)
+    ax5.set_xlabel('Jam dalam Sehari')
+    ax5.set_ylabel('Registered Rentals (Jumlah)')
+    ax5.set_title('Registered Rentals (Sum & Mean) per Hour')
+
+    # Create a second y-axis for mean values
+    ax6 = ax5.twinx()
+    sns.lineplot(x='hour', y='registered_mean', data=average_hourly_user, marker='o', color='purple', label='Registered Mean', ax=ax6)
+    ax6.set_ylabel('Registered Rentals (Rata-rata)')
+    ax6.set_ylim(0, average_hourly_user['registered_mean'].max() * 1.1)  # Adjust the scale for visibility
+
+    # Add legend for the third subplot
+    h5, l5 = ax5.get_legend_handles_labels()
+    h6, l6 = ax6.get_legend_handles_labels()
+    ax5.legend(h5+h6, l5+l6, loc='upper left')
+
+    summary_fig.tight_layout()
+    return boxplot_fig, summary_fig
+
+
+@instrumented
+def plot_rolling_anomalies(anomalies, window_days, threshold):
+    flagged = anomalies[anomalies['anomaly']]
+    # The lines of a long range are daily means, flagged hours stay individual points
+    series = daily_series(anomalies[['dteday', 'cnt', 'rolling_mean', 'rolling_std', 'zscore']])
+    rentals_label = 'Rental per Jam' if len(series) == len(anomalies) else 'Rental per Jam (rata-rata harian)'
+
+    trend_fig = Figure(figsize=(15, 7))
+    ax = trend_fig.subplots()
+    ax.plot(series['dteday'], series['cnt'], color='lightgray', linewidth=0.8, label=rentals_label)
+    ax.plot(series['dteday'], series['rolling_mean'], color='tab:blue', label=f'Rata-Rata {window_days} Hari')
+    ax.fill_between(series['dteday'],
+                    series['rolling_mean'] - 2 * series['rolling_std'],
+                    series['rolling_mean'] + 2 * series['rolling_std'],
+                    color='tab:blue', alpha=0.15, label='Rata-Rata ± 2 Std')
+    ax.scatter(flagged['dteday'], flagged['cnt'], color='tab:red', s=12, zorder=3, label='Anomali')
+    ax.set_title(f'Penyewaan Sepeda per Jam dengan Rata-Rata Bergulir {window_days} Hari')
+    ax.set_xlabel('Tanggal')
+    ax.set_ylabel('Total Rental')
+    ax.legend(loc='upper left')
+
+    zscore_fig = Figure(figsize=(15, 5))
+    ax = zscore_fig.subplots()
+    ax.plot(series['dteday'], series['zscore'], color='tab:gray', linewidth=0.6)
+    ax.scatter(flagged['dteday'], flagged['zscore'], color='tab:red', s=12, zorder=3)
+    for level in (threshold, -threshold):
+        ax.axhline(level, color='tab:red', linestyle='--', linewidth=1)
+    ax.set_title(f'Z-Score terhadap Jam yang Sama {window_days} Hari Sebelumnya ({len(flagged)} anomali)')
+    ax.set_xlabel('Tanggal')
+    ax.set_ylabel('Z-Score')
+    return trend_fig, zscore_fig
+
+
+# Legend labels of the forecast models, with their error over the shown range
+FORECAST_LABELS = {'hour_ahead': 'Prakiraan 1 Jam ke Depan', 'day_ahead': 'Prakiraan 1 Hari ke Depan'}
+
+
+@instrumented
+def plot_forecast(predictions, errors, outlook):
+    mae = dict(zip(errors['model'], errors['mae']))
+    # The errors are over every hour, the lines of a long range are daily means
+    series = daily_series(predictions)
+    actual_label = 'Aktual' if len(series) == len(predictions) else 'Aktual (rata-rata harian)'
+
+    backtest_fig = Figure(figsize=(15, 7))
+    ax = backtest_fig.subplots()
+    ax.plot(series['dteday'], series['cnt'], color='lightgray', linewidth=0.8, label=actual_label)
+    for name, color in zip(FORECAST_LABELS, ['tab:blue', 'tab:orange']):
+        ax.plot(series['dteday'], series[name], color=color, linewidth=0.8, alpha=0.8,
+                label=f'{FORECAST_LABELS[name]} (MAE uji mundur {mae[name]:.1f})')
+    ax.set_title('Penyewaan Sepeda per Jam: Aktual vs Prakiraan (uji mundur, tiap bulan dari model data sebelumnya)')
+    ax.set_xlabel('Tanggal')
+    ax.set_ylabel('Total Rental')
+    ax.legend(loc='upper left')
+
+    outlook_fig = Figure(figsize=(15, 5))
+    ax = outlook_fig.subplots()
+    ax.plot(outlook['dteday'], outlook['cnt'], color='tab:gray', marker='o', markersize=3, label='Aktual (2 hari terakhir)')
+    ax.bar(outlook['dteday'], outlook['day_ahead'], width=1 / 24 * 0.8, color='tab:orange', alpha=0.7,
+           label='Prakiraan 24 jam berikutnya')
+    ax.set_title('Prakiraan Penyewaan Sepeda 24 Jam Setelah Data Terakhir')
+    ax.set_xlabel('Jam')
+    ax.set_ylabel('Total Rental')
+    ax.legend(loc='upper left')
+    return backtest_fig, outlook_fig
+
+
+@instrumented
+def plot_city_comparison(city_monthly):
+    city_monthly = city_monthly.assign(
+        year_month=city_monthly['year'].astype(str) + '-' + city_monthly['month'].astype(str).str.zfill(2))
+
+    trend_fig = Figure(figsize=(15, 7))
+    ax = trend_fig.subplots()
+    sns.lineplot(x='year_month', y='cnt', hue='city', data=city_monthly, marker='o', ax=ax)
+    ax.set_title('Total Penyewaan Sepeda per Bulan di Setiap Kota')
+    ax.set_xlabel('Year-Month (YYYY-MM)')
+    ax.set_ylabel('Total Rental')
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.legend(title='Kota')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    trend_fig.tight_layout()
+
+    totals = city_monthly.groupby('city', sort=True)[['hours', 'registered', 'casual']].sum()
+    average_fig = Figure(figsize=(10, 6))
+    ax = average_fig.subplots()
+    (totals[['registered', 'casual']].div(totals['hours'], axis=0)
+     .plot.bar(stacked=True, color=['tab:blue', 'tab:orange'], alpha=0.8, ax=ax))
+    ax.set_title('Rata-Rata Penyewaan Sepeda per Jam: Pengguna Terdaftar dan Biasa per Kota')
+    ax.set_xlabel('Kota')
+    ax.set_ylabel('Rata-Rata Rental per Jam')
+    ax.legend(['Registered', 'Casual'], title='User Type')
+    ax.tick_params(axis='x', labelrotation=0)
+    return trend_fig, average_fig
+
+
+# Panel renderers: aggregate the selected range and return the figures shown for each question
+def draw_holiday_panel(cube):
+    comparison_data_holiday_and_nonholiday_data = comparison_data_holiday_and_nonholiday(cube)
+    mean_rentals_by_holiday = comparison_holiday_average(cube)
+    return [plot_holiday_comparison(mean_rentals_by_holiday), plot_monthly_rentals(comparison_data_holiday_and_nonholiday_data)]
+
+def draw_seasonal_panel(cube):
+    comparison_seasonal_rentals_data = comparison_seasonal_rentals(cube)
+    return [plot_seasonal_rentals(comparison_seasonal_rentals_data)]
+
+def draw_weather_panel(cube):
+    weather_agg_mean, weather_agg_sum = comparison_weather_conditions(cube)
+    return [plot_weather_correlation(weather_agg_sum, weather_agg_mean)]
+
+def draw_temperature_panel(values, cube):
+    correlation_matrix, comparison_temp_category, comparison_atemp_category = comparison_temperature(values, cube)
+    return list(plot_correlation_temperature(correlation_matrix, comparison_temp_category, comparison_atemp_category))
+
+def draw_yearly_trends_panel(cube):
+    monthly_rentals = comparison_yearly_trends(cube)
+    return [plot_yearly_trends(monthly_rentals)]
+
+def draw_wind_speed_panel(values, cube):
+    correlation_wind_count, windspeed_effect = comparison_wind_speed(values, cube)
+    return list(plot_wind_speed_effect(correlation_wind_count, windspeed_effect))
+
+def draw_registered_vs_casual_panel(cube):
+    user_comparison_melted = comparison_registered_vs_casual(cube)
+    return [plot_registered_vs_casual(user_comparison_melted)]
+
+def draw_hourly_panel(hourly_box_stats, cube):
+    average_hourly_user = comparison_hourly_rentals(cube)
+    return list(plot_hourly_rentals(hourly_box_stats, average_hourly_user))
+
+def draw_city_panel(cities, start_date, end_date):
+    return list(plot_city_comparison(city_monthly_totals(cities, start_date, end_date)))
+
+def draw_anomaly_panel(moments, start_date, end_date, window_days, threshold):
+    anomalies = comparison_rolling_anomalies(moments, start_date, end_date, window_days, threshold)
+    return list(plot_rolling_anomalies(anomalies, window_days, threshold))
+
+def draw_forecast_panel(forecast, data, start_date, end_date):
+    predictions, errors, outlook = comparison_forecast(forecast, data, start_date, end_date)
+    return list(plot_forecast(predictions, errors, outlook))
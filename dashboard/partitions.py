@@ -0,0 +1,196 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from data_loader import DATA_PATH, DTYPES, read_clean_data, write_atomic
+from instrumentation import instrumented
+
+# One directory per city, one Feather file per month: data/cities/<city>/<YYYY>/<MM>.feather
+PARTITION_ROOT = './data/cities'
+PARTITION_WORKERS = int(os.environ.get('DASHBOARD_PARTITION_WORKERS', '4'))
+# Written by every append next to the city's year directories, like the parent metadata of the snapshot
+APPEND_RECORD = 'append.json'
+
+
+def partition_path(root, city, year, month):
+    return os.path.join(root, city, f'{year:04d}', f'{month:02d}.feather')
+
+
+def list_cities(root=PARTITION_ROOT):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+
+# (year, month, path) of every partition of a city, in chronological order
+def list_partitions(root, city):
+    partitions = []
+    city_dir = os.path.join(root, city)
+    for year in sorted(os.listdir(city_dir)) if os.path.isdir(city_dir) else []:
+        if not year.isdigit():
+            continue
+        for name in sorted(os.listdir(os.path.join(city_dir, year))):
+            month, extension = os.path.splitext(name)
+            if extension == '.feather' and month.isdigit():
+                partitions.append((int(year), int(month), os.path.join(city_dir, year, name)))
+    return partitions
+
+
+# Partitions whose month intersects [start_date, end_date], None leaves that side open
+def prune_partitions(partitions, start_date=None, end_date=None):
+    start = (pd.Timestamp(start_date).year, pd.Timestamp(start_date).month) if start_date is not None else None
+    end = (pd.Timestamp(end_date).year, pd.Timestamp(end_date).month) if end_date is not None else None
+    return [
+        (year, month, path) for year, month, path in partitions
+        if (start is None or (year, month) >= start) and (end is None or (year, month) <= end)
+    ]
+
+
+# Version of a city's data, derived from the partition file signatures so no file is read
+def partitions_version(partitions):
+    digest = hashlib.sha256()
+    for _, _, path in partitions:
+        stat = os.stat(path)
+        digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size}\n'.encode())
+    return digest.hexdigest()
+
+
+def _write_partition(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(rows.astype(DTYPES).reset_index(drop=True), preserve_index=False)
+    write_atomic(path, lambda f: feather.write_feather(table, f, compression='uncompressed'))
+
+
+def _by_month(rows):
+    dates = rows['dteday']
+    return rows.groupby([dates.dt.year, dates.dt.month], sort=True)
+
+
+def _append_record_path(root, city):
+    return os.path.join(root, city, APPEND_RECORD)
+
+
+def _partition_rows(partitions):
+    return sum(feather.read_table(path, columns=['dteday'], memory_map=True).num_rows for _, _, path in partitions)
+
+
+# (parent version, parent rows) when the city's current partitions are the result of an append
+# to that version, otherwise None
+def partitions_parent(root, city, version):
+    path = _append_record_path(root, city)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        record = json.load(f)
+    if record.get('version') != version:
+        return None
+    return record['parent_version'], record['parent_rows']
+
+
+# Split cleaned hourly rows of one city into monthly partitions, existing months are replaced
+def write_partitions(data, city, root=PARTITION_ROOT):
+    # Replaced rows do not extend anything
+    if os.path.exists(_append_record_path(root, city)):
+        os.remove(_append_record_path(root, city))
+    paths = []
+    for (year, month), rows in _by_month(data):
+        path = partition_path(root, city, year, month)
+        _write_partition(path, rows)
+        paths.append(path)
+    return paths
+
+
+# Add already cleaned rows newer than the stored ones, only the months they fall into are rewritten.
+# The version before and after is recorded, so the dashboard extends its state instead of rebuilding it.
+def append_partition_rows(rows, city, root=PARTITION_ROOT):
+    partitions = list_partitions(root, city)
+    parent = {'parent_version': partitions_version(partitions), 'parent_rows': _partition_rows(partitions)}
+    paths = []
+    for (year, month), month_rows in _by_month(rows):
+        path = partition_path(root, city, year, month)
+        if os.path.exists(path):
+            existing = feather.read_feather(path, memory_map=True)
+            month_rows = pd.concat([existing, month_rows[existing.columns]], ignore_index=True)
+            month_rows = month_rows.drop_duplicates('dteday', keep='last').sort_values('dteday', kind='stable')
+        _write_partition(path, month_rows)
+        paths.append(path)
+
+    record = {'version': partitions_version(list_partitions(root, city)), **parent}
+    write_atomic(_append_record_path(root, city), lambda f: json.dump(record, f), mode='w')
+    return paths
+
+
+def last_partition_timestamp(root, city):
+    partitions = list_partitions(root, city)
+    if not partitions:
+        return None
+    dates = feather.read_table(partitions[-1][2], columns=['dteday'], memory_map=True)['dteday']
+    return pd.Timestamp(dates[-1].as_py()) if len(dates) else None
+
+
+# Only the partitions intersecting the range are mapped, numeric columns come back without a copy
+def read_partitions(root, city, columns=None, start_date=None, end_date=None):
+    partitions = prune_partitions(list_partitions(root, city), start_date, end_date)
+    if not partitions:
+        raise FileNotFoundError(f'no partitions for {city!r} in {root}')
+    tables = [feather.read_table(path, columns=list(columns) if columns else None, memory_map=True)
+              for _, _, path in partitions]
+    return pa.concat_tables(tables).to_pandas(split_blocks=True)
+
+
+def _partition_totals(city, year, month, path, start, end):
+    data = feather.read_table(path, columns=['dteday', 'casual', 'registered', 'cnt'],
+                              memory_map=True).to_pandas(split_blocks=True)
+    dates = data['dteday']
+    # Only the partitions at either end of the range are cut
+    if len(data) and (dates.iloc[0] < start or dates.iloc[-1] >= end):
+        data = data[(dates >= start) & (dates < end)]
+    return {
+        'city': city,
+        'year': year,
+        'month': month,
+        'hours': len(data),
+        'cnt': int(data['cnt'].sum()),
+        'registered': int(data['registered'].sum()),
+        'casual': int(data['casual'].sum()),
+    }
+
+
+# Monthly totals per city for one date range, every intersecting partition is summed in its own task
+@instrumented
+def city_monthly_totals(cities, start_date, end_date, root=PARTITION_ROOT, workers=PARTITION_WORKERS):
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    tasks = [
+        (city, *partition)
+        for city in cities
+        for partition in prune_partitions(list_partitions(root, city), start_date, end_date)
+    ]
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        partials = list(pool.map(lambda task: _partition_totals(*task, start, end), tasks))
+
+    totals = pd.DataFrame(partials, columns=['city', 'year', 'month', 'hours', 'cnt', 'registered', 'casual'])
+    totals = totals[totals['hours'] > 0].reset_index(drop=True)
+    totals['cnt_mean'] = totals['cnt'] / totals['hours']
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Split a cleaned hourly dataset into monthly partitions of one city.')
+    parser.add_argument('--city', required=True, help='city (directory) name, e.g. washington_dc')
+    parser.add_argument('--data', default=DATA_PATH, help='cleaned dataset CSV')
+    parser.add_argument('--root', default=PARTITION_ROOT, help='partition root directory')
+    args = parser.parse_args()
+
+    for path in write_partitions(read_clean_data(args.data), args.city, args.root):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+
+import numpy as np
+
+from analytics import build_dataset, extend_dataset
+from data_loader import DATA_PATH, file_signature, hash_file, read_data, snapshot_parent, snapshot_path
+from forecast import load_or_train_forecast, save_forecast
+from partitions import PARTITION_ROOT, list_partitions, partitions_parent, partitions_version, read_partitions
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two looks at the data files, 0 checks on every request instead of in the background
+REFRESH_INTERVAL = float(os.environ.get('DASHBOARD_REFRESH_SECONDS', '5'))
+
+
+# The state is shared by every session and thread. Its numpy arrays (histograms, moments,
+# forecast models) are made read-only so an accidental in-place write fails instead of changing
+# what other sessions see. The DataFrames are not frozen: the memory-mapped columns of 'data'
+# are read-only already, 'cube' and 'levels' stay writable and must only be read.
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    return value
+
+
+# One dataset state (rows plus aggregates) per data file, replaced by a new one when the file
+# changes. Builds run in a background thread, readers only ever wait for the first load.
+class DatasetRefresher:
+    def __init__(self, columns, path=DATA_PATH, interval=REFRESH_INTERVAL):
+        self.columns = tuple(columns)
+        self.path = path
+        self.interval = interval
+        self._state = None
+        self._signature = None
+        # Only one build at a time, readers do not take it
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # The CSV and its snapshot, ingest.py writes one after the other
+    def _watched_signature(self):
+        snapshot = snapshot_path(self.path)
+        return file_signature(self.path), file_signature(snapshot) if os.path.exists(snapshot) else None
+
+    def _version(self):
+        return hash_file(self.path)
+
+    # The rows plus (parent version, parent rows) when they extend an earlier version
+    def _read(self, version):
+        return read_data(self.columns, self.path, version), snapshot_parent(snapshot_path(self.path))
+
+    def current(self):
+        state = self._state
+        if state is None or self.interval <= 0:
+            self.refresh()
+            state = self._state
+        return state
+
+    # Extend or rebuild the state when the data changed, True when a new state was swapped in
+    def refresh(self):
+        with self._build_lock:
+            signature = self._watched_signature()
+            state = self._state
+            if state is not None and signature == self._signature:
+                return False
+
+            version = self._version()
+            if state is not None and state['version'] == version:
+                self._signature = signature
+                return False
+
+            data, parent = self._read(version)
+            if state is not None and parent is not None and parent == (state['version'], len(state['data'])):
+                new_state = extend_dataset(state, data, version, parent[1])
+            else:
+                new_state = build_dataset(data, version, self.columns, load_or_train_forecast(data, version, parent))
+            self._save_forecast(new_state['forecast'], version)
+
+            # One reference assignment, a rerun sees either the old or the new state, never a mix
+            self._state = _freeze(new_state)
+            # Taken before the build, a change while building is picked up by the next look
+            self._signature = signature
+            logger.info('Data snapshot %s swapped in (%d rows)', version[:12], len(data))
+            return True
+
+    # Stored so a restart does not fit the models again, failing to write only costs that
+    def _save_forecast(self, forecast, version):
+        try:
+            save_forecast(forecast, version)
+        except OSError:
+            logger.exception('Could not store the forecast models of %s', version[:12])
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            try:
+                signature = self._watched_signature()
+                if signature == self._signature:
+                    pending = None
+                # Files still being written, build once they have not changed for a whole interval
+                elif signature != pending:
+                    pending = signature
+                else:
+                    self.refresh()
+                    pending = None
+            except Exception:
+                logger.exception('Data refresh failed, keeping the current snapshot')
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='data-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# Same for the monthly partitions of one city. The selected city is mapped whole: the date picker
+# bounds and every aggregate are built once per version and shared, a date range then only slices
+# them. Pruning applies where partitions are read per query (cross-city panel, batch_report).
+# An append recorded by append_partition_rows extends the state, any other change rebuilds it.
+class CityDatasetRefresher(DatasetRefresher):
+    def __init__(self, columns, city, root=PARTITION_ROOT, interval=REFRESH_INTERVAL):
+        super().__init__(columns, os.path.join(root, city), interval)
+        self.city = city
+        self.root = root
+
+    def _watched_signature(self):
+        return tuple(
+            (path, file_signature(path)) for _, _, path in list_partitions(self.root, self.city)
+        )
+
+    def _version(self):
+        return partitions_version(list_partitions(self.root, self.city))
+
+    def _read(self, version):
+        return read_partitions(self.root, self.city, self.columns), partitions_parent(self.root, self.city, version)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+HOURS = 24
+WINDOW_DAYS = [7, 14, 28]
+Z_THRESHOLD = 3.0
+# Fewer same-hour observations than this in the baseline window give no z-score
+MIN_BASELINE = 3
+
+
+def _prefix(values):
+    return np.concatenate(([0], np.cumsum(values)))
+
+
+def _series(dates, values):
+    return {'dates': dates, 'values': values, 'sum': _prefix(values), 'sumsq': _prefix(values * values)}
+
+
+def _append_series(series, dates, values):
+    return {
+        'dates': np.concatenate((series['dates'], dates)),
+        'values': np.concatenate((series['values'], values)),
+        'sum': np.concatenate((series['sum'], series['sum'][-1] + np.cumsum(values))),
+        'sumsq': np.concatenate((series['sumsq'], series['sumsq'][-1] + np.cumsum(values * values))),
+    }
+
+
+# Running sums and sums of squares of one column, over all hours and separately per hour of
+# the day. Any trailing window is then two binary searches and a few subtractions per hour.
+# The sums are int64, so the variance is computed exactly without Welford updates.
+def build_moment_index(data, column='cnt'):
+    dates = data['dteday'].to_numpy()
+    if not data['dteday'].is_monotonic_increasing:
+        raise ValueError('data must be sorted by dteday to build the moment index')
+    values = data[column].to_numpy(dtype='int64')
+    hours = data['dteday'].dt.hour.to_numpy()
+    return {
+        'column': column,
+        'all': _series(dates, values),
+        'by_hour': [_series(dates[hours == hour], values[hours == hour]) for hour in range(HOURS)],
+    }
+
+
+# New hours only extend the running sums, nothing already indexed is touched
+def append_to_moment_index(index, data):
+    dates = data['dteday'].to_numpy()
+    if len(dates) == 0:
+        return index
+    if len(index['all']['dates']) and dates[0] <= index['all']['dates'][-1]:
+        raise ValueError('appended rows must be newer than the indexed data')
+    values = data[index['column']].to_numpy(dtype='int64')
+    hours = data['dteday'].dt.hour.to_numpy()
+    return {
+        'column': index['column'],
+        'all': _append_series(index['all'], dates, values),
+        'by_hour': [
+            _append_series(series, dates[hours == hour], values[hours == hour])
+            for hour, series in enumerate(index['by_hour'])
+        ],
+    }
+
+
+def _slice_series(series, start, end):
+    first, last = series['dates'].searchsorted(start, side='left'), series['dates'].searchsorted(end, side='left')
+    return {'dates': series['dates'][first:last], 'values': series['values'][first:last],
+            'sum': series['sum'][first:last + 1], 'sumsq': series['sumsq'][first:last + 1]}
+
+
+# Only the hours rolling_anomalies reads for this range and window, so a panel worker is sent
+# a few weeks of sums instead of the whole history. Windows only use differences of the running
+# sums, which are the same on the sliced arrays.
+def slice_moment_index(index, start_date, end_date, window_days):
+    start = np.datetime64(pd.Timestamp(start_date) - pd.Timedelta(days=window_days))
+    end = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1))
+    return {
+        'column': index['column'],
+        'all': _slice_series(index['all'], start, end),
+        'by_hour': [_slice_series(series, start, end) for series in index['by_hour']],
+    }
+
+
+# Mean and sample standard deviation over (at - window, at], or over [at - window, at) without the
+# current hour, which for a 7 day window is the same hour on each of the 7 previous days
+def _window_stats(series, at, window, include_current=True):
+    dates = series['dates']
+    if include_current:
+        start, end = dates.searchsorted(at - window, side='right'), dates.searchsorted(at, side='right')
+    else:
+        start, end = dates.searchsorted(at - window, side='left'), dates.searchsorted(at, side='left')
+    n = end - start
+    total = series['sum'][end] - series['sum'][start]
+    squares = series['sumsq'][end] - series['sumsq'][start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+        variance = (n * squares - total * total) / (n * (n - 1))
+    return n, mean, np.sqrt(np.clip(variance, 0, None))
+
+
+# Every hour of the range with the rolling mean/std of the trailing window and a z-score against
+# the same hour of the day over the previous window, so rush hours are not flagged as spikes
+def rolling_anomalies(index, start_date, end_date, window_days=WINDOW_DAYS[0], threshold=Z_THRESHOLD):
+    window = np.timedelta64(window_days, 'D')
+    start = np.datetime64(pd.Timestamp(start_date))
+    end = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1))
+    series = index['all']
+    first, last = series['dates'].searchsorted(start, side='left'), series['dates'].searchsorted(end, side='left')
+    dates, values = series['dates'][first:last], series['values'][first:last]
+
+    _, rolling_mean, rolling_std = _window_stats(series, dates, window)
+
+    baseline_mean = np.full(len(dates), np.nan)
+    baseline_std = np.full(len(dates), np.nan)
+    for hour_series in index['by_hour']:
+        hour_dates = hour_series['dates']
+        hour_dates = hour_dates[hour_dates.searchsorted(start, side='left'):hour_dates.searchsorted(end, side='left')]
+        n, mean, std = _window_stats(hour_series, hour_dates, window, include_current=False)
+        positions = dates.searchsorted(hour_dates)
+        baseline_mean[positions] = np.where(n >= MIN_BASELINE, mean, np.nan)
+        baseline_std[positions] = np.where(n >= MIN_BASELINE, std, np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zscore = (values - baseline_mean) / baseline_std
+    zscore[~np.isfinite(zscore)] = np.nan
+    return pd.DataFrame({
+        'dteday': dates,
+        index['column']: values,
+        'rolling_mean': rolling_mean,
+        'rolling_std': rolling_std,
+        'baseline_mean': baseline_mean,
+        'baseline_std': baseline_std,
+        'zscore': zscore,
+        'anomaly': np.abs(zscore) > threshold,
+    })
@@ -0,0 +1,140 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# One cube row per date x hour x holiday x season x weathersit
+CUBE_KEYS = ['date', 'hour', 'holiday', 'season', 'weathersit']
+MEASURES = ['cnt', 'casual', 'registered']
+# Continuous columns kept as moments so correlations can be rebuilt from the cube
+CORRELATION_COLUMNS = ['temp', 'atemp', 'windspeed', 'cnt']
+# Coarser levels of the cube. Holiday and season are fixed for a whole day, so summing away
+# hour and weathersit keeps every total and moment exact. The monthly level is keyed by the
+# first day of the month.
+LEVEL_KEYS = {
+    'daily': ['date', 'holiday', 'season'],
+    'monthly': ['date', 'holiday', 'season'],
+}
+
+
+def _pair_column(x, y):
+    return f'{x}_x_{y}'
+
+
+def build_rollup_cube(data):
+    frame = pd.DataFrame({
+        'date': data['dteday'].dt.normalize(),
+        'hour': data['dteday'].dt.hour.astype('int8'),
+        'holiday': data['holiday'],
+        'season': data['season'],
+        'weathersit': data['weathersit'],
+        'count': np.ones(len(data), dtype='int64'),
+    })
+    for measure in MEASURES:
+        values = data[measure].to_numpy(dtype='int64')
+        frame[f'{measure}_sum'] = values
+        frame[f'{measure}_sumsq'] = values * values
+
+    for column in CORRELATION_COLUMNS:
+        if column not in MEASURES:
+            frame[f'{column}_sum'] = data[column].to_numpy(dtype='float64')
+    for x, y in itertools.combinations_with_replacement(CORRELATION_COLUMNS, 2):
+        if x == y and x in MEASURES:
+            continue
+        frame[_pair_column(x, y)] = data[x].to_numpy(dtype='float64') * data[y].to_numpy(dtype='float64')
+
+    cube = frame.groupby(CUBE_KEYS, sort=True, observed=True).sum().reset_index()
+
+    # Calendar keys used by the monthly panels, derived once instead of on every rerun
+    cube.insert(1, 'year', cube['date'].dt.year.astype('int16'))
+    cube.insert(2, 'month', cube['date'].dt.month.astype('int8'))
+    return cube
+
+
+def _cube_keys(cube):
+    return [column for column in cube.columns if column in CUBE_KEYS + ['year', 'month']]
+
+
+def coarsen_cube(cube, level):
+    keys = LEVEL_KEYS[level]
+    if level == 'monthly':
+        cube = cube.assign(date=cube['date'].dt.to_period('M').dt.to_timestamp())
+    cube = cube.drop(columns=[key for key in CUBE_KEYS if key not in keys])
+    return cube.groupby(_cube_keys(cube), sort=True, observed=True).sum().reset_index()
+
+
+# Merge a cube of newly appended rows into an existing cube of the same level. Only cube rows
+# from the first new date on can share keys with the new rows, everything before that is kept as is.
+def merge_cubes(cube, delta):
+    if len(cube) == 0:
+        return delta
+    if len(delta) == 0:
+        return cube
+
+    split = cube['date'].searchsorted(delta['date'].iloc[0], side='left')
+    tail = pd.concat([cube.iloc[split:], delta], ignore_index=True)
+    tail = tail.groupby(_cube_keys(cube), sort=True, observed=True).sum().reset_index()
+    return pd.concat([cube.iloc[:split], tail[cube.columns]], ignore_index=True)
+
+
+# The cube is sorted by date, so a date range is a binary search and a slice
+def slice_cube(cube, start_date, end_date):
+    dates = cube['date'].to_numpy()
+    start = dates.searchsorted(np.datetime64(start_date, 'ns'), side='left')
+    end = dates.searchsorted(np.datetime64(end_date, 'ns'), side='right')
+    return cube.iloc[start:end]
+
+
+# Rows of the coarsest level that covers the date range exactly: whole months come from the
+# monthly level, the partial months at either end from the daily level. A range without a
+# whole month is answered from the daily level alone.
+def slice_calendar(levels, start_date, end_date):
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    first_month = start if start.is_month_start else start + pd.offsets.MonthBegin(1)
+    last_month = (end if end.is_month_end else end - pd.offsets.MonthEnd(1)).to_period('M').to_timestamp()
+    if first_month > last_month:
+        return slice_cube(levels['daily'], start, end)
+
+    return pd.concat([
+        slice_cube(levels['daily'], start, first_month - pd.Timedelta(days=1)),
+        slice_cube(levels['monthly'], first_month, last_month),
+        slice_cube(levels['daily'], last_month + pd.offsets.MonthBegin(1), end),
+    ], ignore_index=True)
+
+
+# Re-aggregate the cube over any subset of its keys (plus year/month)
+def rollup(cube, by, measures=MEASURES):
+    columns = ['count'] + [f'{m}_{stat}' for m in measures for stat in ('sum', 'sumsq')]
+    grouped = cube.groupby(by, sort=True, observed=True)[columns].sum()
+
+    for measure in measures:
+        total = grouped[f'{measure}_sum']
+        grouped[f'{measure}_mean'] = total / grouped['count']
+        variance = (grouped[f'{measure}_sumsq'] - total * total / grouped['count']) / (grouped['count'] - 1)
+        grouped[f'{measure}_std'] = np.sqrt(variance.clip(lower=0))
+    return grouped.reset_index()
+
+
+def _moment_sum(totals, x, y=None):
+    if y is None:
+        return totals[f'{x}_sum']
+    if x == y and x in MEASURES:
+        return totals[f'{x}_sumsq']
+    if _pair_column(x, y) in totals:
+        return totals[_pair_column(x, y)]
+    return totals[_pair_column(y, x)]
+
+
+# Pearson correlation matrix from the summed moments, same shape as DataFrame.corr()
+def cube_correlation(cube, columns):
+    totals = cube[[c for c in cube.columns if c not in CUBE_KEYS + ['year', 'month']]].sum()
+    n = totals['count']
+
+    matrix = pd.DataFrame(index=columns, columns=columns, dtype='float64')
+    for x in columns:
+        for y in columns:
+            covariance = n * _moment_sum(totals, x, y) - _moment_sum(totals, x) * _moment_sum(totals, y)
+            spread_x = n * _moment_sum(totals, x, x) - _moment_sum(totals, x) ** 2
+            spread_y = n * _moment_sum(totals, y, y) - _moment_sum(totals, y) ** 2
+            matrix.loc[x, y] = covariance / np.sqrt(spread_x * spread_y)
+    return matrix
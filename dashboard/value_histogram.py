@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+from hourly_histogram import HOURS, year_starts
+
+# Weather columns the temperature and wind questions put into categories
+BINNED_COLUMNS = ['temp', 'atemp', 'windspeed']
+# The normalised weather columns take a few dozen distinct values, each gets its own cell.
+# A column with more is reduced to this many equal-width cells, edges are then exact to a cell width.
+MAX_GRID_SIZE = 256
+
+
+# Grid code and cnt of every stored hour, one row per day and -1 for an hour without data.
+# Every row is coded once as the grid value at or below it.
+def _day_codes(data, column, grid):
+    dates = data['dteday'].dt.normalize().to_numpy()
+    days, day_index = np.unique(dates, return_inverse=True)
+    hours = data['dteday'].dt.hour.to_numpy()
+    value_codes = np.clip(np.searchsorted(grid, data[column].to_numpy(), side='right') - 1, 0, len(grid) - 1)
+    codes = np.full((len(days), HOURS), -1, dtype='int16')
+    codes[day_index, hours] = value_codes
+    cnt = np.zeros((len(days), HOURS), dtype='int32')
+    cnt[day_index, hours] = data['cnt'].to_numpy()
+    return days, codes, cnt
+
+
+# Row count and cnt total per grid value of some day rows
+def _value_totals(codes, cnt, size):
+    stored = codes >= 0
+    counts = np.bincount(codes[stored], minlength=size)
+    totals = np.bincount(codes[stored], weights=cnt[stored], minlength=size)
+    return counts.astype('int64'), totals.astype('int64')
+
+
+# Totals before every year start that the days reach and that is not stored yet
+def _add_checkpoints(histogram):
+    days, checkpoints = histogram['days'], histogram['checkpoints']
+    new_checkpoints = year_starts(days)[len(checkpoints):] if len(days) else checkpoints[:0]
+    if not len(new_checkpoints):
+        return histogram
+    counts, cnt = list(histogram['counts']), list(histogram['cnt'])
+    size = len(histogram['grid'])
+    previous = checkpoints[-1] if len(checkpoints) else None
+    for checkpoint in new_checkpoints:
+        if previous is None:
+            counts.append(np.zeros(size, dtype='int64'))
+            cnt.append(np.zeros(size, dtype='int64'))
+        else:
+            rows = slice(days.searchsorted(previous), days.searchsorted(checkpoint))
+            day_counts, day_cnt = _value_totals(histogram['codes'][rows], histogram['day_cnt'][rows], size)
+            counts.append(counts[-1] + day_counts)
+            cnt.append(cnt[-1] + day_cnt)
+        previous = checkpoint
+    return {**histogram, 'checkpoints': np.concatenate((checkpoints, new_checkpoints)),
+            'counts': np.stack(counts), 'cnt': np.stack(cnt)}
+
+
+# Row count and cnt total for every grid value of one column: the totals of all days before each
+# year start, plus the grid code and cnt of every stored hour for the days between a checkpoint
+# and a range end. Any category edges can be applied to a date range afterwards without the rows.
+def build_value_histogram(data, column):
+    grid = np.unique(data[column].to_numpy())
+    if len(grid) > MAX_GRID_SIZE:
+        grid = np.linspace(grid[0], grid[-1], MAX_GRID_SIZE).astype(grid.dtype)
+    days, codes, cnt = _day_codes(data, column, grid)
+    return _add_checkpoints({
+        'column': column, 'days': days, 'grid': grid, 'codes': codes, 'day_cnt': cnt,
+        'checkpoints': np.array([], dtype='datetime64[ns]'),
+        'counts': np.zeros((0, len(grid)), dtype='int64'), 'cnt': np.zeros((0, len(grid)), dtype='int64'),
+    })
+
+
+# Values not seen before widen the grid while it stays small, the stored totals and codes move to
+# their new positions. Otherwise they are counted at the grid value below, like on a reduced grid.
+def _widen(totals, grid, new_grid):
+    if len(new_grid) == len(grid):
+        return totals
+    widened = np.zeros((len(totals), len(new_grid)), dtype=totals.dtype)
+    widened[:, np.searchsorted(new_grid, grid)] = totals
+    return widened
+
+
+def _recode(codes, grid, new_grid):
+    if len(new_grid) == len(grid):
+        return codes
+    positions = np.searchsorted(new_grid, grid).astype(codes.dtype)
+    return np.where(codes >= 0, positions[codes], codes)
+
+
+def append_to_value_histogram(histogram, data):
+    if len(data) == 0:
+        return histogram
+    old_days, grid = histogram['days'], histogram['grid']
+    new_grid = np.union1d(grid, data[histogram['column']].to_numpy())
+    if len(new_grid) > MAX_GRID_SIZE:
+        new_grid = grid
+    days, codes, cnt = _day_codes(data, histogram['column'], new_grid)
+    if len(old_days) and days[0] < old_days[-1]:
+        raise ValueError('appended rows must not be older than the histogram data')
+
+    old_codes, old_cnt = _recode(histogram['codes'], grid, new_grid), histogram['day_cnt']
+    if len(old_days) and days[0] == old_days[-1]:
+        # New hours of the last stored day fill in that day
+        stored = codes[0] >= 0
+        codes[0] = np.where(stored, codes[0], old_codes[-1])
+        cnt[0] = np.where(stored, cnt[0], old_cnt[-1])
+        old_days, old_codes, old_cnt = old_days[:-1], old_codes[:-1], old_cnt[:-1]
+    return _add_checkpoints({
+        'column': histogram['column'],
+        'days': np.concatenate((old_days, days)),
+        'grid': new_grid,
+        'codes': np.concatenate((old_codes, codes)),
+        'day_cnt': np.concatenate((old_cnt, cnt)),
+        'checkpoints': histogram['checkpoints'],
+        'counts': _widen(histogram['counts'], grid, new_grid),
+        'cnt': _widen(histogram['cnt'], grid, new_grid),
+    })
+
+
+# Row counts and cnt totals of every day before `at`: the checkpoint at or before it plus at most a year of days
+def _totals_before(histogram, at):
+    checkpoints, days = histogram['checkpoints'], histogram['days']
+    index = checkpoints.searchsorted(at, side='right') - 1
+    if index < 0:
+        return np.zeros(len(histogram['grid']), dtype='int64'), np.zeros(len(histogram['grid']), dtype='int64')
+    rows = slice(days.searchsorted(checkpoints[index]), days.searchsorted(at))
+    counts, cnt = _value_totals(histogram['codes'][rows], histogram['day_cnt'][rows], len(histogram['grid']))
+    return histogram['counts'][index] + counts, histogram['cnt'][index] + cnt
+
+
+# Grid values occurring in the date range with their row count and cnt total
+def range_values(histogram, start_date, end_date):
+    start = np.datetime64(pd.Timestamp(start_date).normalize())
+    end = np.datetime64(pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1))
+    end_counts, end_cnt = _totals_before(histogram, end)
+    start_counts, start_cnt = _totals_before(histogram, start)
+    counts = end_counts - start_counts
+    occurring = counts > 0
+    return {
+        'values': histogram['grid'][occurring],
+        'counts': counts[occurring],
+        'cnt': (end_cnt - start_cnt)[occurring],
+    }
+
+
+# Edges adapted to one range: 'linear' splits [min, max] into equal widths,
+# 'quantile' puts the same number of rows into every bin as far as ties allow
+def range_edges(values, bins, method='linear'):
+    occurring = values['values']
+    if len(occurring) == 0:
+        return np.array([])
+    if method == 'linear':
+        return np.linspace(occurring[0], occurring[-1], num=bins + 1)
+    if method == 'quantile':
+        cumulative = np.cumsum(values['counts'])
+        positions = np.searchsorted(cumulative, np.linspace(0, 1, bins + 1) * cumulative[-1], side='left')
+        return occurring[np.minimum(positions, len(occurring) - 1)].astype('float64')
+    raise ValueError(f'unknown edge method {method!r}')